@@ -0,0 +1,696 @@
+
+#  alleleLookups.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Lookups used to verify the values in a curator allele input file
+#	    against the database
+#
+#  Usage:
+#
+#      import alleleLookups
+#
+#      lookups = alleleLookups.Lookups()
+#      lookups.load()
+#      if lookups.isReference('J:12345'):
+#          ...
+#
+#      or, to reuse a snapshot of the lookups saved by an earlier run:
+#
+#      lookups = alleleLookups.Lookups()
+#      lookups.loadCached(snapshotFile)
+#
+#  Implementation:
+#
+#      Each lookup is built once per run from a single query and held
+#      in a frozenset (membership only) or a dict (value to attribute)
+#      so that every per-line check in alleleQC.py is a hash probe
+#      rather than a scan of a list. The lookups of values the load
+#      creates rows from (markers, users, terms, references, strains)
+#      map each value to its database key, which alleleQC.py carries
+#      into the load ready file.
+#
+#      The full-table lookups may be saved to a snapshot file. The
+#      snapshot records the result of a set of cheap freshness probes
+#      (row counts and max modification dates of the source tables);
+#      it is reused only while a rerun of the probes returns the same
+#      values, otherwise it is rebuilt from the database.
+#
+#      The full-table queries are independent of each other, so when
+#      more than one thread is requested they are run concurrently on
+#      a small pool of connections (separate from the db module's
+#      connection) and the results merged into the lookups.
+#
+#      When the distinct input values for a lookup are few (at most
+#      targetedMax), the lookup is loaded with a query targeted at those
+#      values instead of the full table. Such a lookup is partial - it
+#      only answers for the input values - so it is never used with a
+#      snapshot: loadCached() always loads and saves the full tables.
+#
+#      Each query run is timed; the query count, rows fetched and wall
+#      and CPU seconds per lookup are kept in Lookups.stats.
+#
+#  History:
+#
+# 10/16/2026
+#       - lookup layer pulled out of alleleQC.loadLookups()
+#
+###########################################################################
+
+import os
+import copy
+import time
+import marshal
+import hashlib
+import concurrent.futures
+import psycopg2
+import psycopg2.pool
+import psycopg2.extras
+import db
+
+#
+#  CONSTANTS
+#
+
+# vocabularies whose terms are verified
+STATUS_VOCAB = 37       # Allele Status
+TYPE_VOCAB = 38         # Allele Type
+INHERIT_VOCAB = 35      # Allele Inheritance Mode
+TRANS_VOCAB = 61        # Allele Transmission
+COLLECTION_VOCAB = 92   # Allele Collection
+SUBTYPE_VOCAB = 93      # Allele Subtype
+MUTATION_VOCAB = 36     # Allele Molecular Mutation
+
+vocabKeyList = [STATUS_VOCAB, TYPE_VOCAB, INHERIT_VOCAB, TRANS_VOCAB,
+    COLLECTION_VOCAB, SUBTYPE_VOCAB, MUTATION_VOCAB]
+
+# max number of values in the 'in' list of a set-based query
+CHUNK_SIZE = 1000
+
+#
+# the queries the lookups are built from
+# name: (query, value column, attribute column(s) or None for a set,
+#        column a targeted query filters on or None if always loaded in full)
+#
+lookupQueries = {
+    'alleleSymbol' : ('''select distinct symbol
+                from all_allele''', 'symbol', None, 'symbol'),
+
+    'geneId' : ('''select a.accid, m.symbol, m._marker_key
+                from acc_accession a, mrk_marker m
+                where a._mgitype_key = 2
+                and a._logicaldb_key = 1
+                and a.prefixPart = 'MGI:'
+                and a._object_key = m._marker_key
+                and m._marker_status_key in (1, 3)
+                and m._organism_key = 1''', 'accid', ('symbol', '_marker_key'), 'a.accid'),
+
+    'user' : ('''select login, _user_key
+                from MGI_User''', 'login', '_user_key', 'login'),
+
+    'term' : ('''select _vocab_key, term, _term_key
+                from VOC_Term
+                where _vocab_key in (%s)''' % ', '.join(map(str, vocabKeyList)), 'term', ('_vocab_key', '_term_key'), None),
+
+    'reference' : ('''select accid, _object_key
+                from  acc_accession
+                where _mgitype_key = 1
+                and _logicaldb_key = 1
+                and prefixPart = 'J:'
+                and preferred = 1''', 'accid', '_object_key', 'accid'),
+
+    'pcl' : ('''select cellline, _cellline_key, celllinestrain
+                from all_cellline_view
+                where isMutant = 0''', 'cellline', ('_cellline_key', 'celllinestrain'), 'cellline'),
+
+    'strain' : ('''select strain, _strain_key
+                from prb_strain
+                where private = 0''', 'strain', '_strain_key', 'strain'),
+
+    'mcl' : ('''select cellline
+                from all_cellline
+                where isMutant = 1''', 'cellline', None, 'cellline'),
+    }
+
+# lookup name : the Lookups attribute holding it
+lookupAttrDict = {'alleleSymbol' : 'alleleSymbols', 'geneId' : 'geneIds',
+    'user' : 'users', 'reference' : 'references', 'pcl' : 'pcls',
+    'strain' : 'strains', 'mcl' : 'mcls'}
+
+# every derivation, for the MCL/PCL/SOO rules
+derivationQuery = '''select v._derivation_key, v._parentcellline_key,
+                    v.creator, t.term as derivationtype
+                from all_cellline_derivation_view v, voc_term t
+                where v._derivationtype_key = t._term_key
+                order by v._derivation_key'''
+
+# schema the pooled connections search, as the db module's connection does
+SCHEMA = 'mgd'
+
+# bump when the lookup attributes or their contents change shape
+SNAPSHOT_VERSION = 3
+
+# Lookups attributes saved in a snapshot - the full-table lookups only,
+# the input-specific lookups are always loaded per run. They must hold
+# only the built-in types marshal can write
+snapshotAttrList = ['alleleSymbols', 'geneIds', 'users', 'terms',
+    'references', 'pcls', 'strains', 'mcls', 'derivations']
+
+#
+# freshness probes, one value per source table, all in one round trip;
+# a row count catches deletes and a max modification date catches
+# inserts and updates. All_Allele_CellLine feeds the input-specific
+# mclMarkers lookup, which the QC cache's verdicts depend on
+#
+freshnessQuery = '''select
+    (select count(*) || '|' || max(modification_date) from all_allele) as all_allele,
+    (select count(*) || '|' || max(modification_date) from mrk_marker) as mrk_marker,
+    (select count(*) || '|' || max(modification_date) from acc_accession) as acc_accession,
+    (select count(*) || '|' || max(modification_date) from mgi_user) as mgi_user,
+    (select count(*) || '|' || max(modification_date) from voc_term
+        where _vocab_key in (%s)) as voc_term,
+    (select count(*) || '|' || max(modification_date) from all_cellline) as all_cellline,
+    (select count(*) || '|' || max(modification_date) from all_allele_cellline) as all_allele_cellline,
+    (select count(*) || '|' || max(modification_date) from all_cellline_derivation) as all_cellline_derivation,
+    (select count(*) || '|' || max(modification_date) from prb_strain) as prb_strain
+    ''' % ', '.join(map(str, vocabKeyList))
+
+class Lookups:
+    #
+    # Is: the database values a curator allele input file is verified against
+    # Has: a frozenset or dict per lookup, keyed by the input value
+    # Does: loads itself from the database, provides O(1) accessors
+    #       for each lookup
+    #
+    def __init__(self, threads = 1, targetedMax = 0):
+
+        self.threads = threads            # max concurrent lookup queries
+        self.targetedMax = targetedMax    # max distinct input values for
+                                          #   which a targeted query is used
+        self.targeted = []                # names of lookups loaded targeted
+
+        self.alleleSymbols = frozenset()  # allele symbols in the database
+        self.geneIds = {}                 # marker MGI ID : (marker symbol,
+                                          #   _marker_key)
+        self.users = {}                   # user login : _user_key
+        self.terms = {}                   # _vocab_key : {term : _term_key}
+        self.references = {}              # J: number : _refs_key
+        self.pcls = {}                    # parent cell line name :
+                                          #   (_cellline_key, strain)
+        self.strains = {}                 # public strain name : _strain_key
+        self.mcls = frozenset()           # mutant cell line names
+        self.version = None               # digest of the freshness probes
+                                          #   the lookups were loaded under
+        self.mclMarkers = {}              # mutant cell line name : list of
+                                          #   marker MGI IDs of its alleles
+        self.mutantCellLines = {}         # mutant cell line name : list of
+                                          #   (_cellline_key, parent cell line,
+                                          #    parent cell line strain)
+        self.derivations = {}             # (_parentcellline_key, creator,
+                                          #   derivation type) : list of
+                                          #   _derivation_key
+        self.stats = {}                   # lookup name : [queries, rows,
+                                          #   wall seconds, cpu seconds]
+        self.fullValues = {}              # lookup name : frozenset of every
+                                          #   value, for lookups loaded
+                                          #   targeted (see validValues)
+
+    #
+    # Purpose: load every lookup from the database
+    # Returns: self
+    # Assumes: a database connection exists
+    # Effects: queries a database
+    #
+    # inputValues is an optional dict of lookup name : set of the
+    # distinct input values that lookup will be asked about
+    #
+    def load(self, inputValues = None):
+
+        queries = {}
+        self.targeted = []
+        for name in lookupQueries:
+            query, valueCol, attrCol, filterCol = lookupQueries[name]
+            values = None
+            if inputValues is not None and filterCol:
+                values = inputValues.get(name)
+            if values is not None and len(values) <= self.targetedMax:
+                queries[name] = targetedQuery(query, filterCol, values)
+                self.targeted.append(name)
+            else:
+                queries[name] = query
+        queries['derivation'] = derivationQuery
+
+        if self.targeted:
+            print('lookups loaded targeted: %s' % ', '.join(self.targeted))
+
+        results = runQueries(queries, self.threads, self.stats)
+
+        self.alleleSymbols = self.buildSet('alleleSymbol', results['alleleSymbol'])
+        self.geneIds = self.buildDict('geneId', results['geneId'])
+        self.users = self.buildDict('user', results['user'])
+        self.references = self.buildDict('reference', results['reference'])
+        self.pcls = self.buildDict('pcl', results['pcl'])
+        self.strains = self.buildDict('strain', results['strain'])
+        self.mcls = self.buildSet('mcl', results['mcl'])
+        self.terms = self.buildTerms(results['term'])
+        self.derivations = self.buildDerivations(results['derivation'])
+
+        return self
+
+    #
+    # Purpose: load the full-table lookups from a snapshot file if the
+    #       snapshot is still fresh, otherwise from the database, then
+    #       save a new snapshot
+    # Returns: self
+    # Assumes: a database connection exists
+    # Effects: queries a database, reads and writes snapshotFile
+    #
+    def loadCached(self, snapshotFile):
+
+        probes = self.probe()
+
+        if self.loadSnapshot(snapshotFile, probes):
+            print('lookups loaded from snapshot: %s' % snapshotFile)
+            return self
+
+        # a snapshot must hold the full tables, so no targeted queries
+        self.load()
+        self.saveSnapshot(snapshotFile, probes)
+
+        return self
+
+    #
+    # Purpose: run the freshness probes
+    # Returns: dict of source table : probe value
+    # Assumes: a database connection exists
+    # Effects: queries a database
+    #
+    def probe(self):
+
+        results = timedSql(freshnessQuery, self.stats, 'probe')
+        probes = {'server' : db.get_sqlServer(), 'database' : db.get_sqlDatabase()}
+        for key, value in results[0].items():
+            probes[key] = str(value)
+        self.version = hashlib.sha1(repr(sorted(probes.items())).encode('utf-8')).hexdigest()
+
+        return probes
+
+    #
+    # Purpose: restore the full-table lookups from a snapshot
+    # Returns: 1 if the snapshot exists and its probes match 'probes', else 0
+    # Assumes: Nothing
+    # Effects: reads snapshotFile
+    #
+    def loadSnapshot(self, snapshotFile, probes):
+
+        if not snapshotFile or not os.path.exists(snapshotFile):
+            return 0
+
+        startWall, startCpu = time.perf_counter(), time.thread_time()
+        try:
+            with open(snapshotFile, 'rb') as fp:
+                snapshot = marshal.load(fp)
+        except:
+            print('cannot read lookup snapshot: %s' % snapshotFile)
+            return 0
+
+        if not isinstance(snapshot, dict) or snapshot.get('snapshotVersion') != SNAPSHOT_VERSION or snapshot.get('probes') != probes:
+            print('lookup snapshot is stale: %s' % snapshotFile)
+            return 0
+
+        for attr in snapshotAttrList:
+            setattr(self, attr, snapshot['lookups'][attr])
+        addStats(self.stats, 'snapshot', 0, 0, time.perf_counter() - startWall, time.thread_time() - startCpu)
+
+        return 1
+
+    #
+    # Purpose: save the full-table lookups to a snapshot
+    # Returns: Nothing
+    # Assumes: the lookups have been loaded under 'probes'
+    # Effects: writes snapshotFile; a failure to write is not fatal
+    #
+    def saveSnapshot(self, snapshotFile, probes):
+
+        if not snapshotFile:
+            return
+
+        snapshot = {'snapshotVersion' : SNAPSHOT_VERSION, 'probes' : probes, 'lookups' : {}}
+        for attr in snapshotAttrList:
+            snapshot['lookups'][attr] = getattr(self, attr)
+
+        # write to a temporary file and rename so a concurrent run never
+        # reads a partial snapshot. marshal, unlike pickle, can't run code
+        # when the load reads the file back
+        tmpFile = '%s.%s' % (snapshotFile, os.getpid())
+        try:
+            with open(tmpFile, 'wb') as fp:
+                marshal.dump(snapshot, fp)
+            os.chmod(tmpFile, 0o644)
+            os.replace(tmpFile, snapshotFile)
+        except:
+            print('cannot write lookup snapshot: %s' % snapshotFile)
+            if os.path.exists(tmpFile):
+                os.remove(tmpFile)
+
+        return
+
+    #
+    # builders - turn the rows of a lookup query into the lookup
+    #
+    def buildTerms(self, results):
+        # one query for all vocabularies, split by _vocab_key
+        query, valueCol, attrCol, filterCol = lookupQueries['term']
+        vocabCol, keyCol = attrCol
+        terms = {}
+        for vocabKey in vocabKeyList:
+            terms[vocabKey] = {}
+        for r in results:
+            terms[r[vocabCol]][r[valueCol]] = r[keyCol]
+        return terms
+
+    def buildSet(self, name, results):
+        query, valueCol, attrCol, filterCol = lookupQueries[name]
+        return frozenset([r[valueCol] for r in results])
+
+    def buildDict(self, name, results):
+        query, valueCol, attrCol, filterCol = lookupQueries[name]
+        if isinstance(attrCol, tuple):
+            return {r[valueCol]: tuple([r[c] for c in attrCol]) for r in results}
+        return {r[valueCol]: r[attrCol] for r in results}
+
+    def buildDerivations(self, results):
+        derivations = {}
+        for r in results:
+            key = (r['_parentcellline_key'], r['creator'], r['derivationtype'])
+            derivations.setdefault(key, []).append(r['_derivation_key'])
+        return derivations
+
+    #
+    # Purpose: make lookups for another input file - the full-table
+    #       lookups are shared, the per-input MCL lookups start empty
+    # Returns: the new Lookups
+    # Assumes: Nothing
+    # Effects: Nothing
+    #
+    def copyForInput(self):
+
+        lookups = copy.copy(self)
+        lookups.mclMarkers = {}
+        lookups.mutantCellLines = {}
+        lookups.stats = {}
+
+        return lookups
+
+    #
+    # Purpose: resolve the marker of the alleles of each named mutant
+    #       cell line with one set-based query per CHUNK_SIZE names
+    # Returns: self
+    # Assumes: a database connection exists
+    # Effects: queries a database
+    #
+    def loadMclMarkers(self, mclNames):
+
+        for chunk in chunkList(sorted(mclNames), CHUNK_SIZE):
+            results = timedSql('''select v.cellline, a.accid
+                from all_allele_cellLine_view v, acc_accession a, all_allele aa
+                where v.isMutant = 1
+                and v.cellline in (%s)
+                and v._allele_key = aa._allele_key
+                and aa._marker_key = a._object_key
+                and a._mgitype_key = 2
+                and a.preferred = 1
+                and a._logicaldb_key = 1 ''' % sqlList(chunk), self.stats, 'mclMarker')
+            for r in results:
+                self.mclMarkers.setdefault(r['cellline'], []).append(r['accid'])
+
+        return self
+
+    #
+    # Purpose: resolve each named mutant cell line to its key and the
+    #       parent cell line/strain of its derivation, one set-based
+    #       query per CHUNK_SIZE names
+    # Returns: self
+    # Assumes: a database connection exists
+    # Effects: queries a database
+    #
+    def loadMutantCellLines(self, mclNames):
+
+        for chunk in chunkList(sorted(mclNames), CHUNK_SIZE):
+            results = timedSql('''select c.cellline, c._cellline_key,
+                    v.parentcellline, v.parentcelllinestrain
+                from all_cellline c, all_cellLine_derivation_view v, voc_term t
+                where c.isMutant = 1
+                and c.cellline in (%s)
+                and v._derivationtype_key = t._term_key
+                and c._derivation_key = v._derivation_key''' % sqlList(chunk), self.stats, 'mutantCellLine')
+            for r in results:
+                self.mutantCellLines.setdefault(r['cellline'], []).append(
+                    (r['_cellline_key'], r['parentcellline'], r['parentcelllinestrain']))
+
+        return self
+
+    #
+    # Purpose: every valid value of a lookup, e.g. to suggest a value
+    #       for an invalid one; a lookup loaded targeted only holds the
+    #       input values, so its full table is queried, once
+    # Returns: iterable of the values
+    # Assumes: a database connection exists
+    # Effects: may query a database
+    #
+    def validValues(self, name, vocabKey = None):
+
+        if name == 'term':
+            return self.terms[vocabKey]
+
+        if name not in self.targeted:
+            return getattr(self, lookupAttrDict[name])
+
+        if name not in self.fullValues:
+            query, valueCol = lookupQueries[name][:2]
+            self.fullValues[name] = frozenset([r[valueCol] for r in timedSql(query, self.stats, name + 'Full')])
+
+        return self.fullValues[name]
+
+    #
+    # accessors
+    #
+    def isAlleleSymbol(self, symbol):
+        return symbol in self.alleleSymbols
+
+    def isGeneID(self, geneID):
+        return geneID in self.geneIds
+
+    def markerSymbol(self, geneID):
+        # returns None if geneID is not a current mouse marker
+        marker = self.geneIds.get(geneID)
+        return marker[0] if marker else None
+
+    def markerKey(self, geneID):
+        # returns None if geneID is not a current mouse marker
+        marker = self.geneIds.get(geneID)
+        return marker[1] if marker else None
+
+    def userKey(self, login):
+        return self.users.get(login)
+
+    def termKey(self, vocabKey, term):
+        return self.terms[vocabKey].get(term)
+
+    def referenceKey(self, jNum):
+        return self.references.get(jNum)
+
+    def strainKey(self, strain):
+        return self.strains.get(strain)
+
+    def isUser(self, login):
+        return login in self.users
+
+    def isTerm(self, vocabKey, term):
+        return term in self.terms[vocabKey]
+
+    def isStatus(self, term):
+        return term in self.terms[STATUS_VOCAB]
+
+    def isType(self, term):
+        return term in self.terms[TYPE_VOCAB]
+
+    def isInheritMode(self, term):
+        return term in self.terms[INHERIT_VOCAB]
+
+    def isTransmission(self, term):
+        return term in self.terms[TRANS_VOCAB]
+
+    def isCollection(self, term):
+        return term in self.terms[COLLECTION_VOCAB]
+
+    def isSubtype(self, term):
+        return term in self.terms[SUBTYPE_VOCAB]
+
+    def isMutation(self, term):
+        return term in self.terms[MUTATION_VOCAB]
+
+    def isReference(self, jNum):
+        return jNum in self.references
+
+    def isPcl(self, cellLine):
+        return cellLine in self.pcls
+
+    def isStrain(self, strain):
+        return strain in self.strains
+
+    def isMcl(self, cellLine):
+        return cellLine in self.mcls
+
+    def parentCellLine(self, cellLine):
+        # (_cellline_key, strain) or None if not a parent cell line
+        return self.pcls.get(cellLine)
+
+    def mutantCellLine(self, cellLine):
+        # list of (_cellline_key, parent cell line, parent cell line strain)
+        return self.mutantCellLines.get(cellLine, [])
+
+    def derivationKeys(self, parentCellLineKey, creator, derivationType):
+        # list of _derivation_key, empty if there is no such derivation
+        return self.derivations.get((parentCellLineKey, creator, derivationType), [])
+
+    def mclMarkerIDs(self, cellLine):
+        # one marker MGI ID per allele associated with the cell line
+        return self.mclMarkers.get(cellLine, [])
+
+# end class Lookups -------------------------------
+
+#
+# Purpose: run independent queries, concurrently if threads > 1
+# Returns: dict of name : list of result rows (dicts keyed by column)
+# Assumes: the db module has been configured for the database
+# Effects: queries a database; when concurrent, opens up to 'threads'
+#       connections of its own and closes them before returning
+# Throws: the first exception raised by any query
+#
+def runQueries(queries, threads = 1, stats = None):
+
+    results = {}
+    if stats is None:
+        stats = {}
+
+    if threads <= 1 or len(queries) <= 1:
+        for name in queries:
+            results[name] = timedSql(queries[name], stats, name)
+        return results
+
+    pool = psycopg2.pool.ThreadedConnectionPool(1, min(threads, len(queries)),
+        host=db.get_sqlServer(), database=db.get_sqlDatabase(),
+        user=db.get_sqlUser(), password=db.get_sqlPassword(),
+        options='-c search_path=%s' % SCHEMA)
+
+    def runQuery(query):
+        startWall, startCpu = time.perf_counter(), time.thread_time()
+        conn = pool.getconn()
+        try:
+            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            cursor.execute(query)
+            rows = cursor.fetchall()
+            cursor.close()
+            conn.rollback()
+        finally:
+            pool.putconn(conn)
+        return rows, time.perf_counter() - startWall, time.thread_time() - startCpu
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+            futures = {}
+            for name in queries:
+                futures[name] = executor.submit(runQuery, queries[name])
+            for name in futures:
+                results[name], wall, cpu = futures[name].result()
+                addStats(stats, name, 1, len(results[name]), wall, cpu)
+    finally:
+        pool.closeall()
+
+    return results
+
+#
+# Purpose: run a query on the db module's connection, timing it
+# Returns: the results of db.sql(query, 'auto')
+# Effects: queries a database, adds to stats[name]
+#
+def timedSql(query, stats, name):
+
+    startWall, startCpu = time.perf_counter(), time.thread_time()
+    results = db.sql(query, 'auto')
+    addStats(stats, name, 1, len(results), time.perf_counter() - startWall, time.thread_time() - startCpu)
+
+    return results
+
+#
+# Purpose: add a query run (or other load step) to the stats of a lookup
+# Returns: Nothing
+# Effects: modifies stats
+#
+def addStats(stats, name, queries, rows, wall, cpu):
+
+    total = stats.setdefault(name, [0, 0, 0.0, 0.0])
+    total[0] += queries
+    total[1] += rows
+    total[2] += wall
+    total[3] += cpu
+
+#
+# Purpose: restrict a lookup query to the given values of filterCol
+# Returns: the targeted query
+#
+def targetedQuery(query, filterCol, values):
+
+    if not values:
+        condition = 'false'
+    else:
+        condition = '%s = any(array[%s])' % (filterCol, sqlList(sorted(values)))
+
+    return addCondition(query, condition)
+
+#
+# Purpose: restrict a lookup query to the given integer keys of filterCol
+# Returns: the keyed query
+#
+def keyedQuery(query, filterCol, keys):
+
+    if not keys:
+        condition = 'false'
+    else:
+        condition = '%s = any(array[%s])' % (filterCol, ', '.join(map(str, sorted(keys))))
+
+    return addCondition(query, condition)
+
+#
+# Purpose: add a condition to the where clause of a query
+# Returns: the query
+#
+def addCondition(query, condition):
+
+    if query.lower().find('where') == -1:
+        return '%s\n                where %s' % (query, condition)
+    return '%s\n                and %s' % (query, condition)
+
+#
+# Purpose: quote a value as a SQL string literal
+# Returns: the quoted string
+#
+def sqlQuote(value):
+    return "'%s'" % str.replace(value, "'", "''")
+
+#
+# Purpose: format values as the body of a SQL 'in' list
+# Returns: comma delimited string of quoted values
+#
+def sqlList(values):
+    return ', '.join(map(sqlQuote, values))
+
+#
+# Purpose: split a list into consecutive chunks of at most 'size' items
+# Returns: a generator of lists
+#
+def chunkList(values, size):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
@@ -20,7 +20,10 @@
 #  Outputs:
 #
 #      - QC report (${QC_RPT})
-#      - intermediate file of QC'd alleles to create
+#      - QC results (${QC_RESULTS}), if configured
+#      - intermediate file of QC'd alleles to create; each line holds
+#        the 24 load columns followed by the database keys the lookups
+#        resolved them to (see loadKeys())
 #
 #  Exit Codes:
 #
@@ -35,10 +38,15 @@
 #      This script will perform following steps:
 #
 #      1) Validate the arguments to the script.
+#         If the QC service (alleleQCd.py) is listening on QC_SOCKET, send
+#         it the input file, write the report and intermediate file it
+#         streams back and exit with its exit code; otherwise continue
 #      2) Perform initialization steps.
 #      3) Open the input/output files.
-#      4) Generate the QC reports.
-#      5) Generate intermediate file of alleles to create
+#      4) Run the QC checks as a read -> parse -> validate -> emit
+#         pipeline, writing each allele that passes to the intermediate
+#         file of alleles to create as it passes
+#      5) Generate the QC reports.
 #      6) Close the input/output files.
 #
 #  History:
@@ -53,7 +61,14 @@ import os
 import string
 import db
 import time
+import hashlib
+import json
+import multiprocessing
+import marshal
+import socket
 import Set
+import alleleLookups
+import alleleSuggest
 
 #
 #  CONSTANTS
@@ -77,8 +92,9 @@ GT = 'Gene trapped'
 EM = 'Endonuclease-mediated'
 alleleTypeList = [TAR, GT, EM]
 
-# list of line numbers written to the QC file
-lineNumberSet = set([])
+# line number : line, for each line written to the QC report; each
+# failing line is held once however many checks it fails
+failedLineDict = {}
 
 # MCL/PCL values
 NS = 'Not Specified' # also allele type and collection default
@@ -117,91 +133,147 @@ genOsnPCLKey = 1069
 # Report file names
 qcRptFile = os.environ['QC_RPT']
 
+# lookup snapshot reused across QC runs while the database is unchanged
+lookupCacheFile = os.getenv('LOOKUP_CACHE')
+
+# number of lookup queries run concurrently
+lookupThreads = int(os.getenv('LOOKUP_THREADS', '1'))
+
+# lookups with at most this many distinct input values are loaded with
+# a query targeted at those values rather than the full table
+lookupTargetedMax = int(os.getenv('LOOKUP_TARGETED_MAX', '0'))
+
 # 1 if any skip or warn errors in the input file
 hasSkipErrors = 0
 hasWarnErrors = 0
 
-# Lookups
-alleleSymbolLookup = []
-geneIdLookup = {}
-userLookup = []
-statusLookup = []
-typeLookup = []
-inheritModeLookup = []
-transmissionLookup = []
-collectionLookup = []
-referenceLookup = []
-pclLookup = []
-strainLookup = []
-mclLookup = []
-subtypeLookup = []
-mutationLookup = []
-
-# report lists
-dupeLineList = []
-missingColumnList = []
-reqColumnList = []
-tarGtMissingMclPclList = []
-emMissingMclPclList = []
-nonTARGTEMwithMclPclList = []
-alleleInDbList = []
+# database lookups (alleleLookups.Lookups), built once by loadLookups()
+lookups = None
+
+# distinct input values per lookup name (see alleleLookups.lookupQueries)
+inputValues = {}
+
+# distinct named (not NS) mutant cell lines in the input file
+inputMclSet = set()
+
+# QC errors, one (line number, rule code, detail) per error found; the
+# detail is the offending value or, for some rules, extra context
+errorIndex = []
 
 # allele symbols seen thus far with their line number
 inputAlleleDict = {}
 
-badGeneIdList = []
-badTgHolderList = []
-badAlleleSymbolList1 = []
-badAlleleSymbolList2 = []
-badUserList = []
-badStatusList = []
-badTypeList = []
-badInheritModeList = []
-# inheritance mode is 'Other (see notes)' and there is not general note
-imOSNnoGenNoteList = [] 
-badTransList = []
-transGermlineNoRefList = []
-transNotGermlineWithRefList = []
-noMclTransNotNAList = []
-mclTransIsNAList = []
-badCollectionList = []
-noOrigRefList = []
-badOrigRefList = []
-badTransRefList = []
-badMolRefList = []
-badIdxRefList = []
-badPclList = []
-osnPclNoGenNoteList = []
-badSooList = []
-badMclList = []
-mismatchedGeneIDList = []
-badSubtypeList = []
-badMolMutList = []
-molMutOtherNoNoteList = []
-
-pclNEdbPclList = []
-sooNEdbStrainList = []
-
-# lines seen in the input file
-distinctLineList = []
-
-# lines that pass QC
-goodLineList = []
-
-# alleles to load - they pass all QC
-allelesToLoadList = []
+# if 'true' the report lists each failing line once, with all its
+# errors, and the sections list line numbers only
+qcRptByLine = os.getenv('QC_RPT_BY_LINE', 'false') == 'true'
+
+#
+# report sections, in report order
+#
+WARN = 'warn'   # reported and loaded
+SKIP = 'skip'   # reported and skipped
+
+HDR_LINE = '%-12s  %-20s%s' % ('Line#','Line', CRT) + 12*'-' + '  ' + 20*'-' + CRT
+HDR_WIDE = '%-12s  %-68s %s' % ('Line#','Line', CRT) + 12*'-' + '  ' + 68*'-' + CRT
+HDR_DUPE = '%-12s  %-12s  %-20s%s' % ('Line#','Dupe of', 'Line', CRT) + 12*'-' + '  ' + 12*'-' + '  ' + 20*'-' + CRT
+HDR_MSYMBOL = '%-12s  %-20s  %-20s%s' % ('Line#','MSymbol', 'Line', CRT) + 12*'-' + '  ' + 20*'-' + 20*'-' + CRT
+
+# relative cost of a QC rule; rules run cheapest first and rules at
+# COST_RESOLVE only run on lines that no cheaper rule has skipped, but
+# all of them run, as one rule's errors don't skip the others
+COST_PARSE = 0      # structural checks run while the line is parsed
+COST_CHECK = 1      # checks of the line's own column values
+COST_LOOKUP = 2     # checks against the in-memory lookups
+COST_RESOLVE = 3    # MCL/derivation resolution
+
+# input columns 1-23, the names the QC rules use for them
+columnNameList = ['aSym', 'aName', 'geneID', 'user', 'alleleStatus',
+    'alleleType', 'inheritMode', 'transmission', 'collection', 'molNote',
+    'nomenNote', 'genNote', 'colonyNote', 'origRef', 'transRef', 'molRef',
+    'idxRefs', 'pcl', 'soo', 'mcls', 'synonyms', 'subtypes', 'molMuts']
+
+# rule codes turned off in the config file, space or comma separated
+disabledRuleSet = set(str.split(os.getenv('QC_DISABLED_RULES', '').replace(',', ' ')))
+
+# rule codes that can't be turned off: a line failing one of these has
+# no alleles to load, so without its report entry it would be dropped
+# silently
+requiredRuleSet = set(['MISSING_COLUMNS', 'MCL_PCL_MISMATCH',
+    'MCL_SOO_MISMATCH', 'NO_DERIVATION'])
+
+# if 'true' the whole input file is parsed into memory and the
+# membership rules are run over each column at once
+qcBatchMode = os.getenv('QC_BATCH_MODE', 'false') == 'true'
+
+# number of processes validating the input file; if more than one the
+# parsed file is split into line ranges validated in parallel
+qcProcesses = int(os.getenv('QC_PROCESSES', '1'))
+
+# QC verdicts of the lines of previous runs, reused for unchanged lines
+# while the lookups, the rules and this code are unchanged
+qcCacheFile = os.getenv('QC_CACHE')
+QC_CACHE_VERSION = 2
+
+# line fingerprint : (list of (rule code, detail), load ready line or
+# None), the verdicts read from the QC cache
+qcCacheLines = {}
+
+# the verdicts of this run's lines, written back to the QC cache
+qcCacheSeen = {}
+
+# if 'true' each QC rule and qcMCL() branch is timed, and a table of the
+# time taken per stage, lookup, rule and branch ends the run's output
+qcTiming = os.getenv('QC_TIMING', 'false') == 'true'
+
+# (section, name) : [calls, rows, wall seconds, cpu seconds], the sections
+# being 'stage', 'lookup', 'rule' and 'qcMCL'; rows are the rows fetched
+# by a lookup, the errors (or lines in error, in batch mode) of a rule
+timingDict = {}
+
+# machine-readable QC results, written as the errors are found: JSON
+# lines, or tab-delimited if the file name ends in .tsv
+qcResultsFile = os.getenv('QC_RESULTS')
+fpResults = None
+
+# data lines read and alleles written to the load ready file
+linesRead = 0
+allelesToLoad = 0
+
+# seconds taken by each stage of the run, in run order
+stageSeconds = {}
+
+# (lookups version, lookup name, vocabulary key) :
+# alleleSuggest.SuggestIndex, built as the report needs them
+suggestIndexDict = {}
+
+# rule code : QcRule, set by init()
+qcRuleDict = {}
+
+# Unix socket of the QC daemon (alleleQCd.py); if it is listening the
+# input file is QC'd by the daemon and this script only writes the
+# results it streams back
+qcSocket = os.getenv('QC_SOCKET')
+
+# enabled rules with a check, cheapest first, set by init()
+activeRuleList = []
+
+# fingerprint of each distinct line seen in the input file : the line
+# number it was first seen on
+lineIndex = {}
 
 class MutantCellLine:
     #
     # Is: data object for a mutant cell line
-    # Has: if mclKey is set - use that to create association
+    # Has: if mclKeyList is set - use that to create association
     #      if derivationKey set - use that to create new NS mcl
     # Does: provides direct access to its attributes
     #
-    def __init__(self):
+    __slots__ = ('mclKeyList', 'derivationKey')
+
+    def __init__(self, mclKeyList = (), derivationKey = None):
         
-        self.mclKeyList = []          # mutant cell line keys existing in the database
-        self.derivationKey = None  # derivation key to use to create new Not Specified mcl
+        self.mclKeyList = mclKeyList        # tuple of mutant cell line keys existing in the database
+        self.derivationKey = derivationKey  # derivation key to use to create new Not Specified mcl
 
 
 class Allele:
@@ -210,6 +282,12 @@ class Allele:
     # Has: a set of allele attributes, strings unless labeled otherwise
     # Does: provides direct access to its attributes
     #
+    __slots__ = ('aSym', 'aName', 'geneID', 'user', 'alleleStatus',
+        'alleleType', 'inheritMode', 'transmission', 'collection', 'molNote',
+        'nomenNote', 'genNote', 'colonyNote', 'origRef', 'transRef', 'molRef',
+        'idxRefs', 'synonyms', 'subtypes', 'molMuts', 'pcl', 'soo', 'mclKeys',
+        'derivationKey', 'keys')
+
     def __init__(self,
         aSym,           # allele symbol
         aName,          # allele name
@@ -260,12 +338,83 @@ class Allele:
         self.soo = soo
         self.mclKeys = mclKeys
         self.derivationKey = derivationKey
+        self.keys = []                      # database keys, see loadKeys()
 
     def toString(this):
         return '%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s' % (this.aSym, this.aName, this.geneID, this.user, this.alleleStatus, this.alleleType, this.inheritMode, this.transmission, this.collection, this.molNote, this.nomenNote, this.genNote, this.colonyNote, this.origRef, this.transRef, this.molRef, this.idxRefs, this.synonyms, this.subtypes, this.molMuts, this.pcl, this.soo, this.mclKeys, this.derivationKey)
 
     def toLoad(this):
-        return '%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s%s' % (this.aSym, TAB, this.aName, TAB, this.geneID, TAB, this.user, TAB, this.alleleStatus, TAB, this.alleleType, TAB, this.inheritMode, TAB, this.transmission, TAB, this.collection, TAB, this.molNote, TAB, this.nomenNote, TAB, this.genNote, TAB, this.colonyNote, TAB, this.origRef, TAB, this.transRef, TAB, this.molRef, TAB, this.idxRefs, TAB, this.synonyms, TAB, this.subtypes, TAB, this.molMuts, TAB, this.pcl, TAB, this.soo, TAB, this.mclKeys, TAB, this.derivationKey, CRT)
+        # one load ready line, the attributes in __slots__ order
+        return TAB.join([this.aSym, this.aName, this.geneID, this.user,
+            this.alleleStatus, this.alleleType, this.inheritMode,
+            this.transmission, this.collection, this.molNote, this.nomenNote,
+            this.genNote, this.colonyNote, this.origRef, this.transRef,
+            this.molRef, this.idxRefs, this.synonyms, this.subtypes,
+            this.molMuts, this.pcl, this.soo, this.mclKeys,
+            str(this.derivationKey)] + this.keys) + CRT
+
+class QcRule:
+    #
+    # Is: a QC rule
+    # Has: rule code, severity, the input columns it reads, relative cost,
+    #      check function, how its report section is written and the
+    #      lookup to suggest valid values from
+    # Does: provides direct access to its attributes
+    #
+    def __init__(self,
+        code,           # rule code, as recorded in the error index
+        severity,       # WARN or SKIP
+        columns,        # names of the input columns the rule reads
+        cost,           # COST_PARSE, COST_CHECK, COST_LOOKUP or COST_RESOLVE
+        check,          # function(fields) -> list of error details, one per 
+                        #   error, empty if the line passes; None for the
+                        #   COST_PARSE rules run by parseLines()
+        title,          # report section title, a tuple of lines
+        header,         # report section column header
+        showDetail,     # 1 if the report section shows the error detail
+        suggest = None):# (lookup name, vocabulary key) the valid values
+                        #   suggested for an invalid detail are from
+
+        self.code = code
+        self.severity = severity
+        self.columns = columns
+        self.cost = cost
+        self.check = check
+        self.title = title
+        self.header = header
+        self.showDetail = showDetail
+        self.suggest = suggest
+
+class ValueCheck:
+    #
+    # Is: the check of a membership rule - each value given in one
+    #     optional column must be in a lookup
+    # Has: column name, name of the Lookups method that validates a value,
+    #      1 if the column is multivalued '|' delimited
+    # Does: checks a line's fields (as a QcRule check), or the distinct
+    #       values of the whole column at once (batch mode)
+    #
+    def __init__(self, column, isValidName, multiValued = 0):
+
+        self.column = column
+        self.isValidName = isValidName
+        self.multiValued = multiValued
+
+    def values(self, value):
+        if value == '':
+            return []
+        if self.multiValued:
+            return str.split(value, '|')
+        return [value]
+
+    def __call__(self, fields):
+        isValid = getattr(lookups, self.isValidName)
+        return [v for v in self.values(fields[self.column]) if not isValid(v)]
+
+    def invalidValues(self, distinctValues):
+        # the invalid ones of a set of column values, each checked once
+        isValid = getattr(lookups, self.isValidName)
+        return set([v for v in distinctValues if not isValid(v)])
 
 #
 # Purpose: Validate the arguments to the script.
@@ -299,16 +448,48 @@ def init ():
     openFiles()
     db.useOneConnection(1)
 
+    initRules()
+
+    # distinct input values the lookups are prefetched for
+    scanInput()
+
     #
     # create lookups
     #
 
     loadLookups()
 
+    loadQcCache()
+
     return
 
 # end init() -------------------------------
 
+# Purpose: pick the QC rules to run, in order of cost
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: sets global variable, exits if QC_DISABLED_RULES names an
+#       unknown rule or one that can't be disabled
+#
+
+def initRules():
+    global activeRuleList, qcRuleDict
+
+    qcRuleDict = dict([(r.code, r) for r in qcRuleList])
+
+    ruleCodeSet = set([r.code for r in qcRuleList])
+    for code in disabledRuleSet:
+        if code not in ruleCodeSet or code in requiredRuleSet:
+            print('QC_DISABLED_RULES: cannot disable %s' % code)
+            sys.exit(1)
+
+    # sort is stable so rules of the same cost keep report order
+    activeRuleList = sorted([r for r in qcRuleList if r.check and r.code not in disabledRuleSet], key=lambda r: r.cost)
+
+    return
+
+# end initRules() -------------------------------
+
 # Purpose: load lookups for verification
 # Returns: Nothing
 # Assumes: 
@@ -316,121 +497,162 @@ def init ():
 #
 
 def loadLookups(): 
-    global alleleSymbolLookup, geneIdLookup, userLookup, statusLookup, typeLookup, inheritModeLookup
-    global transmissionLookup, collectionLookup, referenceLookup, pclLookup
-    global strainLookup, mclLookup, subtypeLookup, mutationLookup
-
-    # Allele Symbol
-    results = db.sql('''select distinct symbol
-                from all_allele''', 'auto')
-
-    for r in results:
-        alleleSymbolLookup.append(r['symbol'])
-
-    # Gene ID
-    results = db.sql('''select a.accid, m.symbol
-                from acc_accession a, mrk_marker m
-                where a._mgitype_key = 2
-                and a._logicaldb_key = 1
-                and a.prefixPart = 'MGI:'
-                and a._object_key = m._marker_key
-                and m._marker_status_key in (1, 3)
-                and m._organism_key = 1''', 'auto')
-    for r in results:
-        geneIdLookup[r['accid']] = r['symbol']
-
-    # User
-    results = db.sql('''select login
-                from MGI_User''', 'auto')
-    for r in results:
-        userLookup.append(r['login'])
-
-    # Status
-    results = db.sql('''select term
-                from VOC_Term
-                where _vocab_key = 37''', 'auto')
-    for r in results:
-        statusLookup.append(r['term'])
-
-    # Type
-    results = db.sql('''select term
-                from VOC_Term
-                where _vocab_key = 38''', 'auto')
-    for r in results:
-        typeLookup.append(r['term'])
-
-
-   # Inheritance Mode
-    results = db.sql('''select term
-                from VOC_Term
-                where _vocab_key = 35''', 'auto')
-    for r in results:
-        inheritModeLookup.append(r['term'])
-
-    # Transmission
-    results = db.sql('''select term
-                from VOC_Term
-                where _vocab_key = 61''', 'auto')
-    for r in results:
-        transmissionLookup.append(r['term'])
-
-    # Collection
-    results = db.sql('''select term
-                from VOC_Term
-                where _vocab_key = 92''', 'auto')
-    for r in results:
-        collectionLookup.append(r['term'])
-
-    # Reference (JNUM)
-    results = db.sql('''select accid
-                from  acc_accession 
-                where _mgitype_key = 1
-                and _logicaldb_key = 1
-                and prefixPart = 'J:'
-                and preferred = 1''', 'auto')
-    for r in results:
-        referenceLookup.append(r['accid'])
-
-    # Parent Cell Line name
-    results = db.sql('''select cellline
-                from all_cellline
-                where isMutant = 0''', 'auto')
-    for r in results:
-        pclLookup.append(r['cellline'])
-
-    # Strain
-
-    results = db.sql('''select strain
-                from prb_strain
-                where private = 0''', 'auto')
-    for r in results:
-        strainLookup.append(r['strain'])
-
-    # Mutant Cell Line Name
-    results = db.sql('''select cellline
-                from all_cellline
-                where isMutant = 1''', 'auto')
-    for r in results:
-        mclLookup.append(r['cellline'])
-
-    # Sub Type
-    results = db.sql('''select term
-                from VOC_Term
-                where _vocab_key = 93''', 'auto')
-    for r in results:
-        subtypeLookup.append(r['term'])
-
-    # Mutation
-    results = db.sql('''select term
-                from VOC_Term
-                where _vocab_key = 36''', 'auto')
-    for r in results:
-        mutationLookup.append(r['term'])
- 
+    global lookups
+
+    lookups = alleleLookups.Lookups(lookupThreads, lookupTargetedMax)
+    if lookupCacheFile:
+        lookups.loadCached(lookupCacheFile)
+    else:
+        lookups.load(inputValues)
+        if qcCacheFile:
+            # the QC cache is keyed by the lookups' version
+            lookups.probe()
+
+    loadInputLookups()
+
     return
 
 # end loadLookups() -------------------------------
 
+# Purpose: load the lookups of the named MCLs in the input file
+# Returns: Nothing
+# Assumes: full-table lookups have been loaded, input has been scanned
+# Effects: queries a database
+#
+
+def loadInputLookups():
+
+    # marker of each named MCL in the input, for the MCL/marker mismatch check
+    lookups.loadMclMarkers(inputMclSet)
+
+    # mutant cell lines for the MCL/PCL/SOO rules
+    lookups.loadMutantCellLines(inputMclSet)
+
+    return
+
+# end loadInputLookups() -------------------------------
+
+# Purpose: compute the key the QC cache is valid for - the lookups'
+#       version, the disabled rules and the code doing the QC
+# Returns: the key
+# Assumes: lookups have been loaded and probed
+# Effects: reads this script and the lookups module
+#
+
+def qcCacheKey():
+
+    code = hashlib.sha1()
+    for sourceFile in (__file__, alleleLookups.__file__):
+        with open(sourceFile, 'rb') as fp:
+            code.update(fp.read())
+
+    return (QC_CACHE_VERSION, lookups.version, sorted(disabledRuleSet), code.hexdigest())
+
+# end qcCacheKey() -------------------------------
+
+# Purpose: read the verdicts of the previous run from the QC cache if
+#       they are still valid
+# Returns: Nothing
+# Assumes: lookups have been loaded
+# Effects: reads the QC cache file, modifies global variables
+#
+
+def loadQcCache():
+    global qcCacheLines
+
+    if not qcCacheFile or not os.path.exists(qcCacheFile):
+        return
+
+    try:
+        with open(qcCacheFile, 'rb') as fp:
+            cache = marshal.load(fp)
+    except:
+        print('cannot read QC cache: %s' % qcCacheFile)
+        return
+
+    if isinstance(cache, dict) and cache.get('key') == qcCacheKey():
+        qcCacheLines = cache['lines']
+        print('QC cache: %s lines' % len(qcCacheLines))
+
+    return
+
+# end loadQcCache() -------------------------------
+
+# Purpose: write the verdicts of this run's lines to the QC cache
+# Returns: Nothing
+# Assumes: QC checks have been run
+# Effects: writes the QC cache file
+#
+
+def saveQcCache():
+
+    if not qcCacheFile:
+        return
+
+    print('QC cache: %s of %s lines reused' % (len(set(qcCacheSeen) & set(qcCacheLines)), len(qcCacheSeen)))
+
+    # write to a temporary file and rename so a concurrent run never
+    # reads a partial cache. marshal, unlike pickle, can't run code when
+    # the load reads the file back
+    tmpFile = '%s.%s' % (qcCacheFile, os.getpid())
+    try:
+        with open(tmpFile, 'wb') as fp:
+            marshal.dump({'key' : qcCacheKey(), 'lines' : qcCacheSeen}, fp)
+        os.chmod(tmpFile, 0o644)
+        os.replace(tmpFile, qcCacheFile)
+    except:
+        print('cannot write QC cache: %s' % qcCacheFile)
+        if os.path.exists(tmpFile):
+            os.remove(tmpFile)
+
+    return
+
+# end saveQcCache() -------------------------------
+
+# Purpose: collect the distinct values in the input file, per lookup,
+#       that are resolved with set-based queries before QC starts
+# Returns: Nothing
+# Assumes: input file has been opened
+# Effects: reads the input file and rewinds it, modifies global variables
+#
+
+def scanInput():
+    global inputMclSet
+
+    for name in ['alleleSymbol', 'geneId', 'user', 'reference', 'pcl', 'strain', 'mcl']:
+        inputValues[name] = set()
+
+    fpInput.readline() # header
+    for line in fpInput:
+        columns = list(map(str.strip, str.split(line, TAB)))
+        if len(columns) < 23:
+            continue
+        (aSym, aName, geneID, user, alleleStatus, alleleType, inheritMode,
+            transmission, collection, molNote, nomenNote, genNote, colonyNote,
+            origRef, transRef, molRef, idxRefs, pcl, soo, mcls, synonyms,
+            subtypes, molMuts) = columns[:23]
+
+        inputValues['alleleSymbol'].add(aSym)
+        inputValues['geneId'].add(geneID)
+        inputValues['user'].add(user)
+        for r in [origRef, transRef, molRef] + str.split(idxRefs, '|'):
+            if r != '':
+                inputValues['reference'].add(r)
+        if pcl != '':
+            inputValues['pcl'].add(pcl)
+        if soo != '':
+            inputValues['strain'].add(soo)
+        if mcls != '':
+            for m in str.split(mcls, '|'):
+                inputValues['mcl'].add(m)
+    fpInput.seek(0)
+
+    inputMclSet = inputValues['mcl'] - set([NS])
+
+    return
+
+# end scanInput() -------------------------------
+
 #
 # Purpose: Open input and output files.
 # Returns: Nothing
@@ -439,7 +661,7 @@ def loadLookups():
 # Throws: Nothing
 #
 def openFiles ():
-    global fpInput, fpLoadReady, fpQcRpt
+    global fpInput, fpLoadReady, fpQcRpt, fpResults
 
     #
     # Open the input file
@@ -471,6 +693,18 @@ def openFiles ():
         print('Cannot open report file: %s' % qcRptFile)
         sys.exit(1)
 
+    #
+    # Open QC results file
+    #
+    if qcResultsFile:
+        try:
+            fpResults = open(qcResultsFile, 'w')
+        except:
+            print('Cannot open results file: %s' % qcResultsFile)
+            sys.exit(1)
+        if qcResultsFile.endswith('.tsv'):
+            fpResults.write('line%srule%sseverity%scolumns%svalue%s' % (TAB, TAB, TAB, TAB, CRT))
+
     return
 
 # end openFiles() -------------------------------
@@ -484,20 +718,26 @@ def openFiles ():
 #
 
 def writeReport():
-    global hasSkipErrors, hasWarnErrors, lineNumberSet
+    global hasSkipErrors, hasWarnErrors
+
+    # group the error index by rule, and by line for the per-line view,
+    # in one pass
+    errorsByRule = {}
+    errorsByLine = {}
+    for lineNum, ruleCode, detail in errorIndex:
+        errorsByRule.setdefault(ruleCode, []).append((lineNum, detail))
+        if qcRptByLine:
+            errorsByLine.setdefault(lineNum, []).append((ruleCode, detail))
 
     #
     # Now write any errors to the report
     #
     fpQcRpt.write( str.center('Warning QC - these will be loaded',80) + CRT)
 
-    if len(alleleInDbList):
-        hasWarnErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Allele Symbols already in the DB (case sensitive)',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(alleleInDbList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(alleleInDbList))
+    for rule in qcRuleList:
+        if rule.severity == WARN and rule.code in errorsByRule:
+            hasWarnErrors = 1
+            writeSection(rule, errorsByRule[rule.code])
 
     # iterate thru the dictionary of all symbols/line numbers in input
     found = 0
@@ -506,8 +746,7 @@ def writeReport():
         if len(inputAlleleDict[a]) > 1:  # we only want to report if the symbol found more than once
             if found == 0: # print the report section header if we found
                 fpQcRpt.write(CRT + CRT + str.center('Allele Symbols duplicated in the input file (case sensitive)',60) + CRT)
-                fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-                fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
+                fpQcRpt.write(HDR_LINE)
                 found = 1
             hasWarnErrors = 1
             fpQcRpt.write('%s    ' % (a))
@@ -520,297 +759,14 @@ def writeReport():
     fpQcRpt.write(CRT + CRT)
     fpQcRpt.write( str.center('Report/Skip QC - these will be reported and skipped',80) + CRT)
 
-    if len(dupeLineList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Lines Duplicated',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(dupeLineList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(dupeLineList))
-
-    if len(missingColumnList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Lines with < 23 Columns',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(CRT.join(missingColumnList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(missingColumnList))
-
-    if len(reqColumnList):
-        hasSkipErrors = 1   
-        fpQcRpt.write(CRT + CRT + str.center('Missing Data in Required Columns',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(reqColumnList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(reqColumnList))
-
-    if len(tarGtMissingMclPclList):
-        fpQcRpt.write(CRT + CRT + str.center('TAR/GT Allele with missing MCL or PCL', 60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(tarGtMissingMclPclList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(tarGtMissingMclPclList))
-
-    if len(emMissingMclPclList):
-        fpQcRpt.write(CRT + CRT + str.center('EM Allele with missing MCL or PCL', 60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(emMissingMclPclList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(emMissingMclPclList))
-
-    if len(nonTARGTEMwithMclPclList):
-        fpQcRpt.write(CRT + CRT + str.center('Non TAR/GT/EM Allele with specified MCL and/or PCL', 60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(nonTARGTEMwithMclPclList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(nonTARGTEMwithMclPclList))
-
-    if len(badGeneIdList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Gene ID',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(badGeneIdList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badGeneIdList))
-
-    if len(badTgHolderList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Marker is "Tg holder" (MGI:2158399) and Allele Status != "Reserved" OR Allele Status != "In Progress"',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(badTgHolderList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badTgHolderList))
-
-    if len(badAlleleSymbolList1):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Marker symbol not in Allele symbol and Allele not Transgenic',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s  %-20s%s' % ('Line#','MSymbol', 'Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(badAlleleSymbolList1))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badAlleleSymbolList1))
-
-    if len(badAlleleSymbolList2):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Allele symbol must either have both < and > or neither',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(badAlleleSymbolList2))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badAlleleSymbolList2))
-
-    if len(badUserList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Invalid User Login',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(badUserList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badUserList))
-
-    if len(badStatusList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Allele Status',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(badStatusList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badStatusList))
-
-    if len(badTypeList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Allele Type',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(badTypeList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badTypeList))
-
-    if len(badInheritModeList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Inheritance Mode',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(badInheritModeList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badInheritModeList))
-
-    if len(imOSNnoGenNoteList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Inheritance Mode "Other (see notes)"',60) + CRT)
-        fpQcRpt.write(str.center('with no General Note',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(imOSNnoGenNoteList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(imOSNnoGenNoteList))
-
-    if len(badTransList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Allele Transmission',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(badTransList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badTransList))
-
-    if len(transGermlineNoRefList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Allele Transmission is Germline or Chimeric and Transmission Reference does not Exist',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(transGermlineNoRefList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(transGermlineNoRefList))
-
-    if len(transNotGermlineWithRefList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Allele Transmission is not Germline or Chimeric and Transmission Reference does Exist',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(transNotGermlineWithRefList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(transNotGermlineWithRefList))
-
-    if len(noMclTransNotNAList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('No MCL and Allele Transmission != "Not Applicable"',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(noMclTransNotNAList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(noMclTransNotNAList))
-
-    if len(mclTransIsNAList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('MCL and Allele Transmission is "Not Applicable"',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(mclTransIsNAList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(mclTransIsNAList))
-
-    if len(badCollectionList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Collection',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(badCollectionList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badCollectionList))
-
-    if len(noOrigRefList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Missing Original Reference',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(noOrigRefList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(noOrigRefList))
-
-    if len(badOrigRefList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Original Reference',60) + CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(badOrigRefList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badOrigRefList))
-
-    if len(badTransRefList):
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Transmission Reference',60)+ CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  '  + 20*'-' + CRT)
-        fpQcRpt.write(''.join(badTransRefList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badTransRefList))
-
-    if len(badMolRefList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Molecular Reference',60)+ CRT)
-        fpQcRpt.write('%-12s  %-20s%s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 20*'-' + CRT)
-        fpQcRpt.write(''.join(badMolRefList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badMolRefList))
-
-    if len(badIdxRefList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Index Reference',60)+ CRT)
-        fpQcRpt.write('%-12s  %-68s %s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 68*'-' + CRT)
-        fpQcRpt.write(''.join(badIdxRefList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badIdxRefList))
-
-    if len(badPclList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Parent Cell Line',60)+ CRT)
-        fpQcRpt.write('%-12s  %-68s %s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 68*'-' + CRT)
-        fpQcRpt.write(''.join(badPclList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badPclList))
-
-    if len(osnPclNoGenNoteList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('PCL Other (see notes) with no General Note',60)+ CRT)
-        fpQcRpt.write('%-12s  %-68s %s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 68*'-' + CRT)
-        fpQcRpt.write(''.join(osnPclNoGenNoteList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(osnPclNoGenNoteList))
-
-    if len(badSooList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Strain of Origin',60)+ CRT)
-        fpQcRpt.write('%-12s  %-68s %s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 68*'-' + CRT)
-        fpQcRpt.write(''.join(badSooList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badSooList))
-
-    if len(badMclList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Mutant Cell Line',60)+ CRT)
-        fpQcRpt.write('%-12s  %-68s %s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 68*'-' + CRT)
-        fpQcRpt.write(''.join(badMclList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badMclList))
-
-    if len(mismatchedGeneIDList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center("MCL marker doesn't match input marker",60)+ CRT)
-        fpQcRpt.write('%-12s  %-68s %s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 68*'-' + CRT)
-        fpQcRpt.write(''.join(mismatchedGeneIDList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(mismatchedGeneIDList))
-
-    if len(badSubtypeList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Allele Subtype',60)+ CRT)
-        fpQcRpt.write('%-12s  %-68s %s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 68*'-' + CRT)
-        fpQcRpt.write(''.join(badSubtypeList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badSubtypeList))
-
-    if len(badMolMutList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Invalid Molecular Mutation',60)+ CRT)
-        fpQcRpt.write('%-12s  %-68s %s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 68*'-' + CRT)
-        fpQcRpt.write(''.join(badMolMutList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(badMolMutList))
-
-    if len(molMutOtherNoNoteList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Molecular Mutation "Other" with no Molecular Note',60)+ CRT)
-        fpQcRpt.write('%-12s  %-68s %s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 68*'-' + CRT)
-        fpQcRpt.write(''.join(molMutOtherNoNoteList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(molMutOtherNoNoteList))
-
-    if len(pclNEdbPclList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Specified MCL where input PCL != DB PCL',60)+ CRT)
-        fpQcRpt.write('%-12s  %-68s %s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 68*'-' + CRT)
-        fpQcRpt.write(''.join(pclNEdbPclList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(pclNEdbPclList))
-
-    if len(sooNEdbStrainList):
-        hasSkipErrors = 1
-        fpQcRpt.write(CRT + CRT + str.center('Specified MCL where input SOO != DB PCL Strain',60)+ CRT)
-        fpQcRpt.write('%-12s  %-68s %s' % ('Line#','Line', CRT))
-        fpQcRpt.write(12*'-' + '  ' + 68*'-' + CRT)
-        fpQcRpt.write(''.join(sooNEdbStrainList))
-        fpQcRpt.write(CRT + 'Total: %s' % len(sooNEdbStrainList))
-
-    # for development - helps to determine which lines in test file are being reported
-    #fpQcRpt.write(CRT + CRT + 'sorted list of line numbers reported: ' + CRT)
-    #sortedList =  list(lineNumberSet)
-    #sortedList.sort()
-    #s = [str(i) for i in sortedList]
-    #fpQcRpt.write(', '.join(s))
+    for rule in qcRuleList:
+        if rule.severity == SKIP and rule.code in errorsByRule:
+            hasSkipErrors = 1
+            writeSection(rule, errorsByRule[rule.code])
+
+    if qcRptByLine and errorsByLine:
+        writeLineView(errorsByLine)
+
     return
 
 # end writeReport() -------------------------------
@@ -823,417 +779,751 @@ def writeReport():
 # Throws: Nothing
 #
 def closeFiles ():
-    global fpInput, fpLoadReady, fpQcRpt
+    global fpInput, fpLoadReady, fpQcRpt, fpResults
     fpInput.close()
     fpLoadReady.close()
     fpQcRpt.close()
+    if fpResults:
+        fpResults.close()
+        fpResults = None
 
     return
 
 # end closeFiles) -------------------------------
 
-    #
-    # Purpose: run all QC checks
-    # Returns: Nothing
-    # Assumes: file descriptors have been initialized
-    # Effects: writes reports and the load ready file to file system
-    # Throws: Nothing
-    #
+#
+# Purpose: record a QC error for a line
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: appends (line number, rule code, detail) to the error index,
+#       keeps the line for the report
+# Throws: Nothing
+#
+
+def reportError(ruleCode, lineNum, line, detail = None):
+
+    errorIndex.append((lineNum, ruleCode, detail))
+    if lineNum not in failedLineDict:
+        failedLineDict[lineNum] = line
+    if fpResults:
+        writeResult(lineNum, ruleCode, detail)
+
+    return
+
+# end reportError() -------------------------------
+
+#
+# Purpose: write a QC error to the results file
+# Returns: Nothing
+# Assumes: results file has been opened
+# Effects: writes to the results file
+# Throws: Nothing
+#
+
+def writeResult(lineNum, ruleCode, detail):
+
+    rule = qcRuleDict[ruleCode]
+    if qcResultsFile.endswith('.tsv'):
+        fpResults.write('%s%s%s%s%s%s%s%s%s%s' % (lineNum, TAB, ruleCode, TAB, rule.severity, TAB, ','.join(rule.columns), TAB, '' if detail is None else detail, CRT))
+    else:
+        fpResults.write(json.dumps({'type' : 'error', 'line' : lineNum, 'rule' : ruleCode, 'severity' : rule.severity, 'columns' : list(rule.columns), 'value' : detail}) + CRT)
+
+    return
+
+# end writeResult() -------------------------------
+
+#
+# Purpose: write the summary of the run to the results file - the
+#       error count per rule, the duplicated allele symbols, line and
+#       allele counts, the exit code and the seconds per stage
+# Returns: Nothing
+# Assumes: the report has been written
+# Effects: writes to the results file
+# Throws: Nothing
+#
+
+def writeResultsSummary():
+
+    if not fpResults:
+        return
+
+    counts = {}
+    for lineNum, ruleCode, detail in errorIndex:
+        counts[ruleCode] = counts.get(ruleCode, 0) + 1
+
+    dupeSymbols = {}
+    for a in inputAlleleDict:
+        if len(inputAlleleDict[a]) > 1:
+            dupeSymbols[a] = [int(n) for n in inputAlleleDict[a]]
+
+    if qcResultsFile.endswith('.tsv'):
+        fpResults.write('#rule%sseverity%scount%s' % (TAB, TAB, CRT))
+        for rule in qcRuleList:
+            if rule.code in counts:
+                fpResults.write('#%s%s%s%s%s%s' % (rule.code, TAB, rule.severity, TAB, counts[rule.code], CRT))
+        for a in dupeSymbols:
+            fpResults.write('#DUPE_SYMBOL%s%s%s%s%s' % (TAB, WARN, TAB, a, CRT))
+        fpResults.write('#lines%s%s%s' % (TAB, linesRead, CRT))
+        fpResults.write('#failedLines%s%s%s' % (TAB, len(failedLineDict), CRT))
+        fpResults.write('#alleles%s%s%s' % (TAB, allelesToLoad, CRT))
+        fpResults.write('#exitCode%s%s%s' % (TAB, exitCode(), CRT))
+        for stage in stageSeconds:
+            fpResults.write('#seconds.%s%s%.3f%s' % (stage, TAB, stageSeconds[stage], CRT))
+    else:
+        ruleCounts = []
+        for rule in qcRuleList:
+            if rule.code in counts:
+                ruleCounts.append({'rule' : rule.code, 'severity' : rule.severity, 'count' : counts[rule.code]})
+        fpResults.write(json.dumps({'type' : 'summary', 'counts' : ruleCounts,
+            'duplicateSymbols' : dupeSymbols, 'lines' : linesRead,
+            'failedLines' : len(failedLineDict), 'alleles' : allelesToLoad,
+            'exitCode' : exitCode(), 'seconds' : stageSeconds}) + CRT)
+
+    return
+
+# end writeResultsSummary() -------------------------------
+
+#
+# Purpose: write the report section of a rule
+# Returns: Nothing
+# Assumes: report file has been opened
+# Effects: writes to the report
+# Throws: Nothing
+#
+
+def writeSection(rule, errors):
+
+    fpQcRpt.write(CRT + CRT + str.center(rule.title[0],60) + CRT)
+    for t in rule.title[1:]:
+        fpQcRpt.write(str.center(t,60) + CRT)
+    fpQcRpt.write(rule.header)
+    fpQcRpt.write(formatErrors(rule, errors))
+    fpQcRpt.write(CRT + 'Total: %s' % len(errors))
+
+    return
+
+# end writeSection() -------------------------------
+
+#
+# Purpose: format the errors of a report section
+# Returns: string of report lines, 'line number  [detail  ]line', each
+#       followed by any suggested values; when the report is by line, the
+#       line itself is left to the per-line view
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+
+def formatErrors(rule, errors):
+
+    rows = []
+    for lineNum, detail in errors:
+        row = str(lineNum)
+        if rule.showDetail:
+            row = '%s  %s' % (row, detail)
+        if qcRptByLine:
+            rows.append(row + CRT)
+        else:
+            rows.append('%s  %s' % (row, failedLineDict[lineNum]))
+        suggestion = suggestionText(rule, detail)
+        if suggestion:
+            rows.append('%14s%s%s' % ('', suggestion, CRT))
+
+    return ''.join(rows)
+
+# end formatErrors() -------------------------------
+
+#
+# Purpose: write the per-line view - each failing line once, followed
+#       by every reason it was reported
+# Returns: Nothing
+# Assumes: report file has been opened
+# Effects: writes to the report
+# Throws: Nothing
+#
+
+def writeLineView(errorsByLine):
+
+    fpQcRpt.write(CRT + CRT + str.center('QC Errors by Line',60) + CRT)
+    fpQcRpt.write(HDR_LINE)
+    for lineNum in sorted(errorsByLine):
+        fpQcRpt.write('%s  %s' % (lineNum, failedLineDict[lineNum]))
+        for ruleCode, detail in errorsByLine[lineNum]:
+            rule = qcRuleDict[ruleCode]
+            title = ' '.join(rule.title)
+            if detail is None:
+                fpQcRpt.write('%14s%s%s' % ('', title, CRT))
+            else:
+                fpQcRpt.write('%14s%s: %s%s' % ('', title, detail, CRT))
+            suggestion = suggestionText(rule, detail)
+            if suggestion:
+                fpQcRpt.write('%16s%s%s' % ('', suggestion, CRT))
+    fpQcRpt.write(CRT + 'Total: %s' % len(errorsByLine))
+
+    return
+
+# end writeLineView() -------------------------------
+
+#
+# Purpose: suggest the closest valid values for an invalid value, if
+#       the rule has a lookup to suggest from; the lookup's index is
+#       built the first time it is asked
+# Returns: 'did you mean: ...?' or '' if nothing is close
+# Assumes: lookups have been loaded
+# Effects: may query a database (see Lookups.validValues), modifies
+#       global variables
+# Throws: Nothing
+#
+
+def suggestionText(rule, detail):
+
+    if not rule.suggest or not detail:
+        return ''
+
+    # the QC daemon keeps the indexes while its lookups are current
+    key = (lookups.version,) + rule.suggest
+    if key not in suggestIndexDict:
+        name, vocabKey = rule.suggest
+        suggestIndexDict[key] = alleleSuggest.SuggestIndex(lookups.validValues(name, vocabKey))
+    suggestions = suggestIndexDict[key].suggest(detail)
+
+    if not suggestions:
+        return ''
+    return 'did you mean: %s?' % ', '.join(suggestions)
+
+# end suggestionText() -------------------------------
+
+#
+# Purpose: compute the duplicate-detection fingerprint of an input line
+# Returns: a digest of the line's columns, each stripped of surrounding
+#       whitespace, so lines differing only in padding or line ending
+#       are duplicates
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+
+def lineFingerprint(columns):
+
+    return hashlib.sha1(TAB.join(columns).encode('utf-8')).digest()
+
+# end lineFingerprint() -------------------------------
+
+#
+# Purpose: run all QC checks as a pipeline of generators
+#       read -> parse -> validate -> emit, writing each allele to the
+#       load ready file as soon as it passes, so memory use does not
+#       grow with the number of alleles loaded. In batch mode the parsed
+#       file is held in memory and the membership rules are run over
+#       whole columns first
+# Returns: Nothing
+# Assumes: file descriptors have been initialized
+# Effects: writes the load ready file, the results file and the QC
+#       cache to file system
+# Throws: Nothing
+#
 
 def runQcChecks():
-    
-    global lineNumberSet 
+    global allelesToLoad, fpResults
+
+    if qcProcesses > 1 or qcBatchMode:
+        # the whole file is parsed before any line is validated, so the
+        # results are held back and written in line order, as a
+        # streaming run writes them; flushed first for the forked shards
+        errorCount = len(errorIndex)
+        if fpResults:
+            fpResults.flush()
+        resultsFile, fpResults = fpResults, None
+        try:
+            if qcProcesses > 1:
+                runShardedQcChecks()
+            else:
+                records = list(parseLines(readLines()))
+                for loadLine in validateRecords(records, batchValidate(uncachedRecords(records))):
+                    fpLoadReady.write(loadLine)
+                    allelesToLoad += 1
+        finally:
+            fpResults = resultsFile
+        if fpResults:
+            for lineNum, ruleCode, detail in sorted(errorIndex[errorCount:], key=lambda e: e[0]):
+                writeResult(lineNum, ruleCode, detail)
+    else:
+        for loadLine in validateRecords(parseLines(readLines())):
+            fpLoadReady.write(loadLine)
+            allelesToLoad += 1
+
+    saveQcCache()
 
-    skipLine = 0
-    junk = fpInput.readline() # header
-    line = fpInput.readline()
-    lineNum = 1
-   
-    while line:
+    return
+
+# end runQcChecks() -------------------------------
+
+#
+# Purpose: sharded QC - the input file is read and parsed (including the
+#       checks across lines) here, the parsed lines are split into line
+#       ranges validated by a pool of forked processes sharing the
+#       lookups, and their errors and alleles are merged back in line
+#       order
+# Returns: Nothing
+# Assumes: file descriptors have been initialized, lookups have been
+#       loaded, fork is available
+# Effects: writes the load ready file to file system, records errors
+# Throws: Nothing
+#
 
-        # flag so we don't report lines with bad allele type n the Non TAR/GT/EM Allele
-        # with specified MCL and/or PCL section
-        badAlleleType = 0
+def runShardedQcChecks():
+    global allelesToLoad
+
+    records = list(parseLines(readLines()))
+
+    # several shards per process to even out the work
+    shardSize = max(1, -(-len(records) // (qcProcesses * 4)))
+    shards = [records[i:i + shardSize] for i in range(0, len(records), shardSize)]
+
+    # flush first, a forked process flushes its copy of any buffered output
+    for fp in (fpLoadReady, fpQcRpt, fpResults):
+        if fp:
+            fp.flush()
+
+    pool = multiprocessing.get_context('fork').Pool(qcProcesses)
+    try:
+        for shardErrors, shardFailedLines, shardLoadLines, shardCacheSeen, shardTimings in pool.imap(validateShard, shards):
+            for section, name in shardTimings:
+                calls, rows, wall, cpu = shardTimings[(section, name)]
+                addTiming(section, name, wall, cpu, calls, rows)
+            errorIndex.extend(shardErrors)
+            qcCacheSeen.update(shardCacheSeen)
+            for lineNum in shardFailedLines:
+                if lineNum not in failedLineDict:
+                    failedLineDict[lineNum] = shardFailedLines[lineNum]
+            fpLoadReady.write(''.join(shardLoadLines))
+            allelesToLoad += len(shardLoadLines)
+    finally:
+        pool.close()
+        pool.join()
+
+    return
+
+# end runShardedQcChecks() -------------------------------
+
+#
+# Purpose: validate one shard of parsed lines, in a pool process
+# Returns: (error index, failed line dictionary, load ready lines, QC
+#       cache verdicts, timings) of the shard
+# Assumes: run in a process forked after the lookups were loaded
+# Effects: resets the process' copy of the error globals
+# Throws: Nothing
+#
+
+def validateShard(records):
+    global errorIndex, failedLineDict, fpResults, timingDict
+
+    # the fork copied the parent's errors, report the shard's only;
+    # the parent writes the results
+    errorIndex = []
+    failedLineDict = {}
+    fpResults = None
+    timingDict = {}
+
+    if qcBatchMode:
+        loadLines = list(validateRecords(records, batchValidate(uncachedRecords(records))))
+    else:
+        loadLines = list(validateRecords(records))
+
+    return errorIndex, failedLineDict, loadLines, qcCacheSeen, timingDict
+
+# end validateShard() -------------------------------
+
+#
+# Purpose: read stage of the QC pipeline
+# Returns: a generator of (line number, line) for each line after the header
+# Assumes: input file has been opened
+# Effects: reads the input file
+# Throws: Nothing
+#
+
+def readLines():
+    global linesRead
+
+    fpInput.readline() # header
+    lineNum = 1
+    for line in fpInput:
         lineNum += 1
-        #print('lineNum: %s %s' % (lineNum, line))
+        linesRead += 1
+        yield lineNum, line
+
+    return
+
+# end readLines() -------------------------------
+
+#
+# Purpose: parse stage of the QC pipeline - checks for duplicate lines
+#       and lines with too few columns, and records the line numbers of
+#       each allele symbol; all the checks across lines are done here
+# Returns: a generator of (line number, line, stripped columns, skip flag)
+#       for each line with at least 23 columns
+# Assumes: Nothing
+# Effects: records errors
+# Throws: Nothing
+#
+
+def parseLines(lines):
+
+    for lineNum, line in lines:
+        skipLine = 0
+
+        columns = list(map(str.strip, str.split(line, TAB)))
+
         # check for dupes
-        if line not in distinctLineList:
-            distinctLineList.append(line)
-        else:
-            dupeLineList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-        # check that the file has at least 23 columns
-        if len(str.split(line, TAB)) < 23:
-            missingColumnList.append('%s  %s' % (lineNum, line))
-            line = fpInput.readline()
-            lineNumberSet.add(lineNum)
-            continue
-        # get columns 1-23
-        (aSym, aName, geneID, user, alleleStatus, alleleType, inheritMode, 
-            transmission, collection, molNote, nomenNote, genNote, colonyNote, 
-            origRef, transRef, molRef, idxRefs, pcl, soo, mcls, synonyms, 
-            subtypes, molMuts) = list(map(str.strip, str.split( \
-                line, TAB)))[:23]
-
-        #
-        # check required columns
-        #
-        if aSym == '' or aName == '' or geneID == '' or user == '' or transmission == '' or soo == '':
-            # REPORT required fields that are empty
-            reqColumnList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-
-        # alleleType has default when empty
-        if alleleType != '' and alleleType not in typeLookup:
-              badTypeList.append('%s  %s' % (lineNum, line))
-              skipLine = 1
-              lineNumberSet.add(lineNum)
-              badAlleleType = 1 
-
-        # if allele type is TAR/GT and MCL is null or PCL is null
-        # matrix rows 4/5a
-        if alleleType in [TAR, GT] and (not mcls or not pcl):
-            tarGtMissingMclPclList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-
-        # if allele type is EM then both MCL and PCL must be specified
-        # matrix rows 4/5b
-        if alleleType == EM:
-            if (mcls and not pcl) or (not mcls and pcl): 
-                emMissingMclPclList.append('%s  %s' % (lineNum, line))
+        if 'DUPE_LINE' not in disabledRuleSet:
+            fingerprint = lineFingerprint(columns)
+            if fingerprint not in lineIndex:
+                lineIndex[fingerprint] = lineNum
+            else:
+                reportError('DUPE_LINE', lineNum, line, lineIndex[fingerprint])
                 skipLine = 1
-                lineNumberSet.add(lineNum)
-
-        # Non TAR/GT/EM alleles should have neither MCL or PCL specified
-        # matrix rows 7/8
-        if not badAlleleType and alleleType not in alleleTypeList and (mcls or pcl):
-            nonTARGTEMwithMclPclList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-        # 
-        # verify fields that are required in the database and in file
-        #
-
-        # if neither < or > OK, if both < and > OK, otherwise report
-        if (aSym.find('<') == -1 and aSym.find('>') == -1) or (aSym.find('<') != -1 and aSym.find('>') != -1):
-            pass
-        else:
-            badAlleleSymbolList2.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
 
-        if aSym in alleleSymbolLookup:
-            alleleInDbList.append('%s  %s' % (lineNum, line))
-            lineNumberSet.add(lineNum)
+        # check that the file has at least 23 columns
+        if len(columns) < 23:
+            reportError('MISSING_COLUMNS', lineNum, line)
+            continue
 
+        aSym = columns[0]
         if aSym not in inputAlleleDict:
             inputAlleleDict[aSym] = []
         inputAlleleDict[aSym].append(str(lineNum))
-        print('geneID: %s' % geneID)
-        if geneID not in geneIdLookup:
-            badGeneIdList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-
-        if geneID in geneIdLookup and geneID == tgHolder and alleleStatus != '' and alleleStatus not in ['In Progress', 'Reserved']:
-            badTgHolderList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-
-        # if the marker symbol is not part of the allele symbol and allele type is not transgenic
-        if geneID in geneIdLookup and aSym.find(geneIdLookup[geneID]) == -1 and alleleType != 'Transgenic':
-            # report and skip
-            badAlleleSymbolList1.append('%s  %s  %s\n' % (lineNum, geneIdLookup[geneID], line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-
-        if user not in userLookup:
-            badUserList.append('%s  %s' % (lineNum, line))
-            skipLine = 1            
-            lineNumberSet.add(lineNum)
-        
-        #
-        # verify fields required in the database, but when null have defaults
-        #
-        if alleleStatus != '' and  alleleStatus not in statusLookup:
-            badStatusList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-        if inheritMode != '': 
-            if inheritMode not in inheritModeLookup:
-                badInheritModeList.append('%s  %s' % (lineNum, line))
-                skipLine = 1
-                lineNumberSet.add(lineNum)
-            elif inheritMode == OSN and genNote == '':
-                imOSNnoGenNoteList.append('%s  %s' % (lineNum, line))
-                skipLine = 1
-                lineNumberSet.add(lineNum)
-        if transmission != '' and transmission not in transmissionLookup:
-            badTransList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-        if transmission != '' and (transmission == 'Germline' or transmission == 'Chimeric') and transRef == '':
-            transGermlineNoRefList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-        if transmission != '' and transmission != 'Germline' and transmission != 'Chimeric' and transRef != '':
-            transNotGermlineWithRefList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-        if not mcls and transmission != 'Not Applicable':
-            noMclTransNotNAList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-            lineNumberSet.add(lineNum)
-        if mcls and transmission == 'Not Applicable':
-            mclTransIsNAList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-
-        if collection != '' and collection not in collectionLookup:
-            badCollectionList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-        if origRef == '':
-            noOrigRefList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-        elif origRef not in referenceLookup:
-            badOrigRefList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-        if soo != '' and soo not in strainLookup:
-            badSooList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-        #
-        # Verify optional fields, some multivalued
-        #
-
-        # References (J:)
-        if transRef != '' and transRef not in referenceLookup:
-            badTransRefList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-        if molRef != '' and molRef not in referenceLookup:
-            badMolRefList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-        # can have multiple
-        if idxRefs != '':
-            for r in str.split(idxRefs, '|'):
-                if r not in referenceLookup:
-                    badIdxRefList.append('%s  %s' % (lineNum, line))
-                    skipLine = 1
-                    lineNumberSet.add(lineNum)
-        if pcl != '' and pcl not in pclLookup:
-            badPclList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-        if pcl!= '' and pcl == OSN and genNote == '':
-            osnPclNoGenNoteList.append('%s  %s' % (lineNum, line))
-            skipLine = 1
-            lineNumberSet.add(lineNum)
-        # can have multiple
-        if mcls != '':
-            for m in str.split(mcls, '|'):
-                if m not in mclLookup:
-                    #print('bad mcl: %s' % m)
-                    badMclList.append('%s  %s' % (lineNum, line))
-                    skipLine = 1
-                    lineNumberSet.add(lineNum) 
-                # if MCL in the database, lookup it's marker ID in the db, report
-                # if different than the incoming marker ID
-                elif m != NS:
-                    sql = '''select a.accid
-                        from all_allele_cellLine_view v, acc_accession a, all_allele aa
-                        where v.isMutant = 1
-                        and v.cellline = '%s'
-                        and v._allele_key = aa._allele_key
-                        and aa._marker_key = a._object_key
-                        and a._mgitype_key = 2
-                        and a.preferred = 1
-                        and a._logicaldb_key = 1 ''' % m
-                    #print(sql)
-                    results = db.sql(sql, 'auto')
-                    #print(results)
-                    if len(results) < 1 or len(results) > 1:
-                        print('MCL is not NS and marker id lookup has no results or too many results')
-                        #print(results)
-                    else:
-                        dbGeneID = results[0]['accid']
-                        if geneID != dbGeneID:
-                            mismatchedGeneIDList.append('%s  %s' % (lineNum, line))
-                            skipLine = 1
-                            lineNumberSet.add(lineNum)
-        # can have multiple
-        if subtypes != '':
-            for s in str.split(subtypes, '|'):
-                if s not in subtypeLookup:
-                    badSubtypeList.append('%s  %s' % (lineNum, line))
-                    skipLine = 1
-                    lineNumberSet.add(lineNum) 
-        # can have multiple
-        if molMuts != '':
-            # if molecular mutation = 'Other', there must be a molecular note
-            for m in str.split(molMuts, '|'):
-                if m not in mutationLookup:
-                    badMolMutList.append('%s  %s' % (lineNum, line))
-                    skipLine = 1
-                    lineNumberSet.add(lineNum)
-                elif m == 'Other' and molNote == '':
-                    molMutOtherNoNoteList.append('%s  %s' % (lineNum, line))
-                    skipLine = 1
-                    lineNumberSet.add(lineNum)
-        if skipLine == 0:
-            # A list of MutantCellLine objects
-            resolvedMcls = []
-
-            # these will remain blank if not TAR/GT or EM allele type
-            mclKeys = ''
-            derivationKey = ''
-
-            # We have a TAR/GT/EM allele that passes QC thus far AND mcls and
-            # pcl are specified (EM can have null mcl/pcl in which case there 
-            # will be no mcl association/creation)
-            # now find the mcl or correct derivation, to create NS MCL, 
-            # using the MCL/PCL/SOO rules
-            if alleleType in alleleTypeList and mcls and pcl:
-                # attempt to resolve the mcls for this allele
-                # if resolvedMcls empty, we could not resolve so skip this allele
-                resolvedMcls = qcMCL(aSym, mcls, pcl, soo, alleleType, line, lineNum) 
-                if not resolvedMcls:
+
+        yield lineNum, line, columns, skipLine
+
+    return
+
+# end parseLines() -------------------------------
+
+#
+# Purpose: validate stage with the QC cache - a line with a verdict in
+#       the cache has its errors recorded and its load ready line
+#       emitted from the cache, any other line is validated and its
+#       verdict kept for the cache. Lines the parse stage skipped
+#       (duplicates) are always validated, the checks across lines
+#       having been run on the whole file by then
+# Returns: a generator of the load ready line of each allele that
+#       passes QC
+# Assumes: lookups have been loaded, rules have been initialized
+# Effects: records errors, modifies global variables
+# Throws: Nothing
+#
+
+def validateRecords(records, batchErrors = None):
+
+    for record in records:
+        lineNum, line, columns, skipLine = record
+
+        if skipLine:
+            for alleleToLoad in validateLines([record], batchErrors):
+                yield alleleToLoad.toLoad()
+            continue
+
+        fingerprint = lineFingerprint(columns)
+        if fingerprint in qcCacheLines:
+            errors, loadLine = qcCacheLines[fingerprint]
+            for ruleCode, detail in errors:
+                reportError(ruleCode, lineNum, line, detail)
+        else:
+            errorCount = len(errorIndex)
+            loadLine = None
+            for alleleToLoad in validateLines([record], batchErrors):
+                loadLine = alleleToLoad.toLoad()
+            errors = [(e[1], e[2]) for e in errorIndex[errorCount:]]
+
+        if qcCacheFile:
+            qcCacheSeen[fingerprint] = (errors, loadLine)
+        if loadLine:
+            yield loadLine
+
+    return
+
+# end validateRecords() -------------------------------
+
+#
+# Purpose: pick the parsed lines without a verdict in the QC cache
+# Returns: list of records
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+
+def uncachedRecords(records):
+
+    return [r for r in records if r[3] or lineFingerprint(r[2]) not in qcCacheLines]
+
+# end uncachedRecords() -------------------------------
+
+#
+# Purpose: batch mode validation - runs the active membership rules
+#       (ValueCheck) over whole columns: each distinct value of a column
+#       is checked once, then the lines holding an invalid value are
+#       picked out
+# Returns: {rule code : {line number : error details}}, an entry for
+#       every batched rule
+# Assumes: lookups have been loaded, rules have been initialized
+# Effects: Nothing
+# Throws: Nothing
+#
+
+def batchValidate(records):
+
+    lineNums = [r[0] for r in records]
+    columnIndex = dict([(c, i) for i, c in enumerate(columnNameList)])
+
+    batchErrors = {}
+    for rule in activeRuleList:
+        if not isinstance(rule.check, ValueCheck):
+            continue
+        vc = rule.check
+        startWall, startCpu = time.perf_counter(), time.thread_time()
+        column = [r[2][columnIndex[vc.column]] for r in records]
+
+        distinctValues = set()
+        for value in set(column):
+            distinctValues.update(vc.values(value))
+        invalidValues = vc.invalidValues(distinctValues)
+
+        errors = {}
+        if invalidValues:
+            for lineNum, value in zip(lineNums, column):
+                details = [v for v in vc.values(value) if v in invalidValues]
+                if details:
+                    errors[lineNum] = details
+        batchErrors[rule.code] = errors
+        if qcTiming:
+            addTiming('rule', rule.code, time.perf_counter() - startWall, time.thread_time() - startCpu, len(records), len(errors))
+
+    return batchErrors
+
+# end batchValidate() -------------------------------
+
+#
+# Purpose: validate stage of the QC pipeline - runs the active QC rules
+#       on each parsed line, cheapest first; the MCL/derivation
+#       resolution rules are not run for lines already skipped
+#       batchErrors, if given, holds the errors of rules already run over
+#       whole columns by batchValidate(), {rule code : {line number : 
+#       error details}}; those rules are not run again per line
+# Returns: a generator of the Allele for each line that passes QC
+# Assumes: lookups have been loaded, rules have been initialized
+# Effects: records errors
+# Throws: Nothing
+#
+
+def validateLines(records, batchErrors = None):
+
+    if batchErrors is None:
+        batchErrors = {}
+
+    for lineNum, line, columns, skipLine in records:
+
+        # columns 1-23 by name
+        fields = dict(zip(columnNameList, columns[:23]))
+
+        # whether the line was skipped before MCL resolution; the
+        # resolution rules share one resolution, so all or none run
+        skipBeforeResolve = None
+
+        for rule in activeRuleList:
+            if rule.cost >= COST_RESOLVE:
+                if skipBeforeResolve is None:
+                    skipBeforeResolve = skipLine
+                if skipBeforeResolve:
+                    break
+            if rule.code in batchErrors:
+                details = batchErrors[rule.code].get(lineNum, [])
+            elif qcTiming:
+                details = timedCheck(rule, fields)
+            else:
+                details = rule.check(fields)
+            for detail in details:
+                reportError(rule.code, lineNum, line, detail)
+                if rule.severity == SKIP:
                     skipLine = 1
-                else:
-                    for mObject in resolvedMcls:
-                        if mObject.mclKeyList:
-                            mclKeys = '|'.join(mObject.mclKeyList)
-                        elif mObject.derivationKey:
-                            derivationKey = mObject.derivationKey
-        if skipLine == 0:
-            goodLineList.append(line)
-            if alleleStatus == '':
-                alleleStatus = RES
-            if alleleType == '':
-                alleleType = NS
-            if inheritMode == '':
-                inheritMode = NA
-            if collection == '':
-                collection = NS
-            
-            
-            alleleToLoad = Allele(aSym, aName, geneID, user, alleleStatus, alleleType, inheritMode, transmission, collection, molNote, nomenNote, genNote, colonyNote, origRef, transRef, molRef, idxRefs, synonyms, subtypes, molMuts, pcl, soo, mclKeys, derivationKey)
-            allelesToLoadList.append(alleleToLoad)
-            #print('%s %s' % (lineNum, alleleToLoad.toString()))
-        skipLine = 0
 
-        line = fpInput.readline()
+        if skipLine:
+            continue
+
+        # these will remain blank if not TAR/GT or EM allele type
+        mclKeys = ''
+        derivationKey = ''
+
+        # We have a TAR/GT/EM allele that passes QC AND mcls and pcl are 
+        # specified (EM can have null mcl/pcl in which case there will be
+        # no mcl association/creation)
+        if needsMclResolution(fields):
+            # if resolvedMcls empty, we could not resolve so skip this allele
+            resolvedMcls = resolveMcls(fields)[0]
+            if not resolvedMcls:
+                continue
+            for mObject in resolvedMcls:
+                if mObject.mclKeyList:
+                    mclKeys = '|'.join(mObject.mclKeyList)
+                elif mObject.derivationKey:
+                    derivationKey = mObject.derivationKey
+
+        f = fields
+        alleleStatus = f['alleleStatus'] or RES
+        alleleType = f['alleleType'] or NS
+        inheritMode = f['inheritMode'] or NA
+        collection = f['collection'] or NS
+
+        allele = Allele(f['aSym'], f['aName'], f['geneID'], f['user'], alleleStatus, alleleType, inheritMode, f['transmission'], collection, f['molNote'], f['nomenNote'], f['genNote'], f['colonyNote'], f['origRef'], f['transRef'], f['molRef'], f['idxRefs'], f['synonyms'], f['subtypes'], f['molMuts'], f['pcl'], f['soo'], mclKeys, derivationKey)
+        allele.keys = loadKeys(allele)
+
+        yield allele
+
     return
 
-# end runQcChecks() -------------------------------
+# end validateLines() -------------------------------
+
+#
+# Purpose: the database keys of the allele's values that the load
+#       creates rows from, so the load need not resolve them again
+# Returns: list of 14 key strings: marker, creator, status, type,
+#       inheritance mode, transmission, collection, strain of origin,
+#       original, transmission, molecular and index references,
+#       subtypes and mutations; multi-valued columns are '|' delimited,
+#       and a column with a value the lookups have no key for is empty,
+#       for the load to resolve by name
+# Assumes: lookups have been loaded
+# Effects: Nothing
+# Throws: Nothing
+#
+
+def loadKeys(a):
+
+    def keyOf(key):
+        return '' if key is None else str(key)
+
+    def keysOf(values, keyFunc):
+        if values == '':
+            return ''
+        keyList = [keyFunc(v) for v in values.split('|')]
+        if None in keyList:
+            return ''
+        return '|'.join(map(str, keyList))
+
+    def termKeysOf(values, vocabKey):
+        return keysOf(values, lambda t: lookups.termKey(vocabKey, t))
+
+    return [keyOf(lookups.markerKey(a.geneID)),
+        keyOf(lookups.userKey(a.user)),
+        keyOf(lookups.termKey(alleleLookups.STATUS_VOCAB, a.alleleStatus)),
+        keyOf(lookups.termKey(alleleLookups.TYPE_VOCAB, a.alleleType)),
+        keyOf(lookups.termKey(alleleLookups.INHERIT_VOCAB, a.inheritMode)),
+        keyOf(lookups.termKey(alleleLookups.TRANS_VOCAB, a.transmission)),
+        keyOf(lookups.termKey(alleleLookups.COLLECTION_VOCAB, a.collection)),
+        keyOf(lookups.strainKey(a.soo)),
+        keysOf(a.origRef, lookups.referenceKey),
+        keysOf(a.transRef, lookups.referenceKey),
+        keysOf(a.molRef, lookups.referenceKey),
+        keysOf(a.idxRefs, lookups.referenceKey),
+        termKeysOf(a.subtypes, alleleLookups.SUBTYPE_VOCAB),
+        termKeysOf(a.molMuts, alleleLookups.MUTATION_VOCAB)]
+
+# end loadKeys() -------------------------------
+
+#
+# Purpose: determine if a line's MCLs must be resolved to a MCL or
+#       derivation in the database, i.e. a TAR/GT/EM allele with MCL and
+#       PCL specified
+# Returns: 1 if so, else 0
+# Assumes: Nothing
+# Effects: Nothing
+# Throws: Nothing
+#
+
+def needsMclResolution(fields):
+
+    return fields['alleleType'] in alleleTypeList and fields['mcls'] != '' and fields['pcl'] != ''
+
+# end needsMclResolution() -------------------------------
+
+#
+# Purpose: resolve a line's MCLs once, however many rules ask
+# Returns: (list of MutantCellLine objects, {rule code : error details})
+# Assumes: needsMclResolution(fields)
+# Effects: caches the result in fields
+# Throws: Nothing
+#
+
+def resolveMcls(fields):
+
+    if 'mclResolution' not in fields:
+        fields['mclResolution'] = qcMCL(fields['mcls'], fields['pcl'], fields['soo'], fields['alleleType'])
+
+    return fields['mclResolution']
+
+# end resolveMcls() -------------------------------
 
 #
 # Purpose: QC the MCL and a) find MCL in database to associated with the 
 #       allele or find the derivation in the database with which to create
 #       a new Not Specified MCL
-# Returns:  a list of MutantCellLine objects
+# Returns:  (list of MutantCellLine objects, {rule code : error details})
 # Assumes: Nothing
-# Effects:  queries a database
+# Effects:  Nothing
 # Throws: Nothing
 #
 
-def qcMCL(aSym, mcls, pcl, soo, alleleType, line, lineNum):
+def qcMCL(mcls, pcl, soo, alleleType):
 
     # a list of MutantCellLine objects (see class)
     resolvedMclList = []
 
-    #print(CRT + CRT + 'In qcMCL')
-    #print('in qcMCL  lineNum: %s allele symbol: %s, mcls: %s pcl: %s soo: %s alleleType: %s ' % (lineNum, aSym, mcls, pcl, soo, alleleType))
+    # rule code : error details
+    errorDict = {}
 
     for m in str.split(mcls, '|'):
-        #print('m: %s' % m)
+        if qcTiming:
+            startWall, startCpu = time.perf_counter(), time.thread_time()
+
         if m != NS: # rows 10-12 in the matrix
-            #print('mcl != NS: lineNum: %s allele symbol: %s, mcls: %s pcl: %s soo: %s alleleType: %s' % (lineNum, aSym, mcls, pcl, soo, alleleType))
-            # lookup PCL for MCL in ALL_CellLine_Derivation_view
+            # lookup PCL for MCL in the derivation index
             # if same as incoming PCL and incoming strain, QC passes
-            sql = '''select c._cellline_key, v.parentcellline, v.parentcelllinestrain
-                from all_cellline c, all_cellLine_derivation_view v, voc_term t
-                where c.isMutant = 1
-                and c.cellline = '%s'
-                and v._derivationtype_key = t._term_key
-                and c._derivation_key = v._derivation_key''' % (m)
-
-            #print(sql)
-            results = db.sql(sql, 'auto')
-            
-            if len(results) != 1:
-                print ('result != 1 for mcl: %s  %s' % (m, results))
+            dbMcls = lookups.mutantCellLine(m)
+
+            if len(dbMcls) != 1:
+                print ('result != 1 for mcl: %s  %s' % (m, dbMcls))
+                errorDict.setdefault('NO_DERIVATION', []).append(m)
             else:
-                dbPcl = results[0]['parentcellline']
-                dbStrain =  results[0]['parentcelllinestrain']
-                mclKey = results[0]['_cellline_key']
+                mclKey, dbPcl, dbStrain = dbMcls[0]
                 # if the incoming pcl does not match the mcl pcl in the database
                 # report and skip
                 if pcl != dbPcl:
-                    pclNEdbPclList.append('%s  %s' % (lineNum, line))
-                    lineNumberSet.add(lineNum)
-                    #print('pcl != dbPcl')
+                    errorDict.setdefault('MCL_PCL_MISMATCH', []).append(m)
 
                 # if the incoming soo does not match the pcl strain in the database
                 # report and skip
                 elif soo != dbStrain:
-                    sooNEdbStrainList.append('%s  %s' % (lineNum, line))
-                    lineNumberSet.add(lineNum)
-                    #print('soo != dbStrain')
+                    errorDict.setdefault('MCL_SOO_MISMATCH', []).append(soo)
                 
                 # otherwise use the incoming named mcl
                 else:
-                    #print('mcl != NS - incoming mcl used')
-                    mclResolved = MutantCellLine()
-                    mclResolved.mclKeyList.append(str(mclKey))
-                    resolvedMclList.append(mclResolved)
+                    resolvedMclList.append(MutantCellLine(mclKeyList = (str(mclKey),)))
                 
         else: # m == NS
+            pclKeyToUse = None
+
             if pcl not in (NS, OSN):
-                #print('mcl=NS, pcl not in (NS, OSN): lineNum: %s allele symbol: %s, mcls: %s pcl: %s soo: %s alleleType: %s' % (lineNum, aSym, mcls, pcl, soo, alleleType))
-                # find the PCL
-                results = db.sql('''select c._cellline_key as _parentcellline_key, c.cellline as parentcellline, c.celllinestrain as parentcelllinestrain
-                    from all_cellline_view c
-                    where c.isMutant = 0
-                    and cellline = '%s' ''' % pcl, 'auto')
-                #print('length of results: %s' % len(results))
-                # check that the pcl strain in db same as incoming soo
-                if soo != results[0]['parentcelllinestrain']:
-                    sooNEdbStrainList.append('%s  %s' % (lineNum, line))
-                    lineNumberSet.add(lineNum)
-                    #print('soo != dbStrain')
+                # find the PCL, check that its strain in db same as incoming soo
+                dbPcl = lookups.parentCellLine(pcl)
+                if dbPcl is None:
+                    errorDict.setdefault('NO_DERIVATION', []).append(pcl)
+                elif soo != dbPcl[1]:
+                    errorDict.setdefault('MCL_SOO_MISMATCH', []).append(soo)
                 else:
-                    pclKey = results[0]['_parentcellline_key']
-                    # find the derivation to use
-                    sql = '''select v.name, v._derivation_key, 
-                            v._parentcellline_key, v.parentcellline, v.parentcelllinestrain 
-                        from all_cellline_derivation_view v, voc_term t
-                        where v._parentcellline_key = %s
-                         and v.creator = '%s'
-                        and v._derivationtype_key = t._term_key
-                        and t.term = '%s' ''' % (pclKey, NS, alleleType)
-                    #print(sql + '\n')
-                    results = db.sql(sql, 'auto')
-                    #print(results)
-                    #print(CRT + CRT)   
-                    mclToCreate = MutantCellLine()
-                    mclToCreate.derivationKey = results[0]['_derivation_key']
-                    resolvedMclList.append(mclToCreate)
+                    pclKeyToUse = dbPcl[0]
+
             elif pcl == NS:
                 # no checking needed here - just have to determine the correct Derivation to create the 
                 # new NS MCL with
-                #print ('mcl NS, pcl NS: lineNum: %s allele symbol: %s, mcls: %s pcl: %s soo: %s alleleType: %s ' % (lineNum, aSym, mcls, pcl, soo, alleleType))
-                # find the pcl
-                pclKeyToUse = 0
-
                 if soo == one29:
                     pclKeyToUse = osnOne29Key
                 elif soo == one29SSvEv:
@@ -1241,29 +1531,9 @@ def qcMCL(aSym, mcls, pcl, soo, alleleType, line, lineNum):
                 else:
                     pclKeyToUse = genNsPCLKey
 
-                sql = '''select v.name, v._derivation_key,
-                            v._parentcellline_key, v.parentcellline, v.parentcelllinestrain
-                        from all_cellline_derivation_view v, voc_term t
-                        where v._parentcellline_key = '%s'
-                        and v.creator = '%s'
-                        and v._derivationtype_key = t._term_key
-                        and t.term = '%s' ''' % (pclKeyToUse, NS, alleleType)
-                #print(sql + '\n')
-                results = db.sql(sql, 'auto')
-                #print(results)
-                #print(CRT + CRT)
-                mclToCreate = MutantCellLine()
-                mclToCreate.derivationKey = results[0]['_derivation_key']
-                resolvedMclList.append(mclToCreate)
-
-# strains with derivations in the db
             elif pcl == OSN:
                 # no checking needed here - just have to determine the correct Derivation to create the
                 # new NS MCL with  
-                #print ('mcl NS, pcl OSN: lineNum: %s allele symbol: %s, mcls: %s pcl: %s soo: %s alleleType: %s ' % (lineNum, aSym, mcls, pcl, soo, alleleType))
-                # find the pcl
-                pclKeyToUse = 0
-
                 if soo == one29:
                     pclKeyToUse = osnOne29Key
                 elif soo == one29P2OlaHsd:
@@ -1273,67 +1543,553 @@ def qcMCL(aSym, mcls, pcl, soo, alleleType, line, lineNum):
                 else:
                     pclKeyToUse = genOsnPCLKey
 
-                # now find the derivation
-                sql = '''select v.name, v._derivation_key,
-                            v._parentcellline_key, v.parentcellline, v.parentcelllinestrain
-                        from all_cellline_derivation_view v, voc_term t
-                        where v._parentcellline_key = '%s'
-                        and v.creator = '%s'
-                        and v._derivationtype_key = t._term_key
-                        and t.term = '%s' ''' % (pclKeyToUse, NS, alleleType)
-                #print(sql + '\n')
-                results = db.sql(sql, 'auto')
-                #print(results)
-                #print(CRT + CRT)
-                mclToCreate = MutantCellLine()
-                mclToCreate.derivationKey = results[0]['_derivation_key']
-                # wait - are we creating a mcl for this?
-                resolvedMclList.append(mclToCreate)
-    return resolvedMclList
+            if pclKeyToUse is not None:
+                # find the derivation to create the new NS MCL with
+                derivationKeys = lookups.derivationKeys(pclKeyToUse, NS, alleleType)
+                if not derivationKeys:
+                    print('no derivation for pcl key: %s creator: %s type: %s' % (pclKeyToUse, NS, alleleType))
+                    errorDict.setdefault('NO_DERIVATION', []).append(alleleType)
+                else:
+                    resolvedMclList.append(MutantCellLine(derivationKey = derivationKeys[0]))
+
+        if qcTiming:
+            if m != NS:
+                branch = 'named MCL'
+            elif pcl == NS:
+                branch = 'NS MCL, NS PCL'
+            elif pcl == OSN:
+                branch = 'NS MCL, OSN PCL'
+            else:
+                branch = 'NS MCL, named PCL'
+            addTiming('qcMCL', branch, time.perf_counter() - startWall, time.thread_time() - startCpu)
+
+    return resolvedMclList, errorDict
 
 # end qcMCL() -------------------------------
 
-def writeLoadReadyFile():
-    for a in allelesToLoadList:
-        fpLoadReady.write(a.toLoad())
+#
+# QC rule checks
+#
+# Each takes the fields of a line, {column name : value}, and returns a
+# list of error details, one per error found, empty if the line passes.
+# A detail of None means the rule has nothing to add to the line itself.
+#
+
+def checkRequiredColumn(f):
+    for c in ('aSym', 'aName', 'geneID', 'user', 'transmission', 'soo'):
+        if f[c] == '':
+            return [None]
+    return []
+
+def checkTargtNoMclPcl(f):
+    # matrix rows 4/5a
+    if f['alleleType'] in [TAR, GT] and (not f['mcls'] or not f['pcl']):
+        return [None]
+    return []
+
+def checkEmNoMclPcl(f):
+    # EM: both MCL and PCL or neither, matrix rows 4/5b
+    if f['alleleType'] == EM and bool(f['mcls']) != bool(f['pcl']):
+        return [None]
+    return []
+
+def checkNonTargtemMclPcl(f):
+    # matrix rows 7/8; an invalid allele type is reported as such instead
+    alleleType = f['alleleType']
+    if (alleleType == '' or lookups.isType(alleleType)) and alleleType not in alleleTypeList and (f['mcls'] or f['pcl']):
+        return [None]
+    return []
+
+def checkSymbolBrackets(f):
+    # if neither < or > OK, if both < and > OK, otherwise report
+    aSym = f['aSym']
+    if (aSym.find('<') == -1) != (aSym.find('>') == -1):
+        return [aSym]
+    return []
+
+def checkTransGermlineNoRef(f):
+    if f['transmission'] in ('Germline', 'Chimeric') and f['transRef'] == '':
+        return [None]
+    return []
+
+def checkTransRefNotGermline(f):
+    if f['transmission'] not in ('', 'Germline', 'Chimeric') and f['transRef'] != '':
+        return [f['transRef']]
+    return []
+
+def checkNoMclTransNotNA(f):
+    if not f['mcls'] and f['transmission'] != 'Not Applicable':
+        return [f['transmission']]
+    return []
+
+def checkMclTransNA(f):
+    if f['mcls'] and f['transmission'] == 'Not Applicable':
+        return [f['mcls']]
+    return []
+
+def checkNoOrigRef(f):
+    if f['origRef'] == '':
+        return [None]
+    return []
+
+def checkPclOsnNoNote(f):
+    if f['pcl'] == OSN and f['genNote'] == '':
+        return [None]
+    return []
+
+def checkAlleleInDb(f):
+    if lookups.isAlleleSymbol(f['aSym']):
+        return [f['aSym']]
+    return []
+
+def checkBadGeneId(f):
+    if not lookups.isGeneID(f['geneID']):
+        return [f['geneID']]
+    return []
+
+def checkTgHolderStatus(f):
+    alleleStatus = f['alleleStatus']
+    if f['geneID'] == tgHolder and lookups.isGeneID(tgHolder) and alleleStatus != '' and alleleStatus not in ['In Progress', 'Reserved']:
+        return [alleleStatus]
+    return []
+
+def checkSymbolNoMarker(f):
+    # the marker symbol is not part of the allele symbol and allele type is not transgenic
+    geneID = f['geneID']
+    if lookups.isGeneID(geneID) and f['aSym'].find(lookups.markerSymbol(geneID)) == -1 and f['alleleType'] != 'Transgenic':
+        return [lookups.markerSymbol(geneID)]
+    return []
+
+def checkBadUser(f):
+    if not lookups.isUser(f['user']):
+        return [f['user']]
+    return []
+
+def checkInheritOsnNoNote(f):
+    if f['inheritMode'] == OSN and lookups.isInheritMode(OSN) and f['genNote'] == '':
+        return [None]
+    return []
+
+def checkMclMarkerMismatch(f):
+    # if MCL in the database, lookup it's marker ID in the db, report
+    # if different than the incoming marker ID
+    errors = []
+    if f['mcls'] == '':
+        return errors
+    for m in str.split(f['mcls'], '|'):
+        if m != NS and lookups.isMcl(m):
+            dbGeneIDs = lookups.mclMarkerIDs(m)
+            if len(dbGeneIDs) != 1:
+                print('MCL is not NS and marker id lookup has no results or too many results')
+            elif f['geneID'] != dbGeneIDs[0]:
+                errors.append(m)
+    return errors
+
+def checkMutationOtherNoNote(f):
+    # if molecular mutation = 'Other', there must be a molecular note
+    if f['molMuts'] == '' or f['molNote'] != '' or not lookups.isMutation('Other'):
+        return []
+    return [None for m in str.split(f['molMuts'], '|') if m == 'Other']
+
+# the MCL/PCL/SOO rules share one resolution of the line's MCLs
+def checkMclResolution(f, ruleCode):
+    if not needsMclResolution(f):
+        return []
+    return resolveMcls(f)[1].get(ruleCode, [])
+
+def checkMclPclMismatch(f):
+    return checkMclResolution(f, 'MCL_PCL_MISMATCH')
+
+def checkMclSooMismatch(f):
+    return checkMclResolution(f, 'MCL_SOO_MISMATCH')
+
+def checkNoDerivation(f):
+    return checkMclResolution(f, 'NO_DERIVATION')
+
+# end QC rule checks -------------------------------
+
+#
+# QC rule registry, in report order
+#
+qcRuleList = [
+    QcRule('ALLELE_IN_DB', WARN, ('aSym',), COST_LOOKUP, checkAlleleInDb,
+        ('Allele Symbols already in the DB (case sensitive)',), HDR_LINE, 0),
+    QcRule('DUPE_LINE', SKIP, tuple(columnNameList), COST_PARSE, None,
+        ('Lines Duplicated',), HDR_DUPE, 1),
+    QcRule('MISSING_COLUMNS', SKIP, (), COST_PARSE, None,
+        ('Lines with < 23 Columns',), HDR_LINE, 0),
+    QcRule('REQUIRED_COLUMN', SKIP, ('aSym', 'aName', 'geneID', 'user', 'transmission', 'soo'), COST_CHECK, checkRequiredColumn,
+        ('Missing Data in Required Columns',), HDR_LINE, 0),
+    QcRule('TARGT_NO_MCL_PCL', SKIP, ('alleleType', 'mcls', 'pcl'), COST_CHECK, checkTargtNoMclPcl,
+        ('TAR/GT Allele with missing MCL or PCL',), HDR_LINE, 0),
+    QcRule('EM_NO_MCL_PCL', SKIP, ('alleleType', 'mcls', 'pcl'), COST_CHECK, checkEmNoMclPcl,
+        ('EM Allele with missing MCL or PCL',), HDR_LINE, 0),
+    QcRule('NON_TARGTEM_MCL_PCL', SKIP, ('alleleType', 'mcls', 'pcl'), COST_LOOKUP, checkNonTargtemMclPcl,
+        ('Non TAR/GT/EM Allele with specified MCL and/or PCL',), HDR_LINE, 0),
+    QcRule('BAD_GENE_ID', SKIP, ('geneID',), COST_LOOKUP, checkBadGeneId,
+        ('Invalid Gene ID',), HDR_LINE, 0),
+    QcRule('TG_HOLDER_STATUS', SKIP, ('geneID', 'alleleStatus'), COST_LOOKUP, checkTgHolderStatus,
+        ('Marker is "Tg holder" (MGI:2158399) and Allele Status != "Reserved" OR Allele Status != "In Progress"',), HDR_LINE, 0),
+    QcRule('SYMBOL_NO_MARKER', SKIP, ('aSym', 'geneID', 'alleleType'), COST_LOOKUP, checkSymbolNoMarker,
+        ('Marker symbol not in Allele symbol and Allele not Transgenic',), HDR_MSYMBOL, 1),
+    QcRule('SYMBOL_BRACKETS', SKIP, ('aSym',), COST_CHECK, checkSymbolBrackets,
+        ('Allele symbol must either have both < and > or neither',), HDR_LINE, 0),
+    QcRule('BAD_USER', SKIP, ('user',), COST_LOOKUP, checkBadUser,
+        ('Invalid User Login',), HDR_LINE, 0,
+        ('user', None)),
+    QcRule('BAD_STATUS', SKIP, ('alleleStatus',), COST_LOOKUP, ValueCheck('alleleStatus', 'isStatus'),
+        ('Invalid Allele Status',), HDR_LINE, 0,
+        ('term', alleleLookups.STATUS_VOCAB)),
+    QcRule('BAD_TYPE', SKIP, ('alleleType',), COST_LOOKUP, ValueCheck('alleleType', 'isType'),
+        ('Invalid Allele Type',), HDR_LINE, 0,
+        ('term', alleleLookups.TYPE_VOCAB)),
+    QcRule('BAD_INHERIT_MODE', SKIP, ('inheritMode',), COST_LOOKUP, ValueCheck('inheritMode', 'isInheritMode'),
+        ('Invalid Inheritance Mode',), HDR_LINE, 0,
+        ('term', alleleLookups.INHERIT_VOCAB)),
+    QcRule('INHERIT_OSN_NO_NOTE', SKIP, ('inheritMode', 'genNote'), COST_LOOKUP, checkInheritOsnNoNote,
+        ('Inheritance Mode "Other (see notes)"', 'with no General Note'), HDR_LINE, 0),
+    QcRule('BAD_TRANSMISSION', SKIP, ('transmission',), COST_LOOKUP, ValueCheck('transmission', 'isTransmission'),
+        ('Invalid Allele Transmission',), HDR_LINE, 0,
+        ('term', alleleLookups.TRANS_VOCAB)),
+    QcRule('TRANS_GERMLINE_NO_REF', SKIP, ('transmission', 'transRef'), COST_CHECK, checkTransGermlineNoRef,
+        ('Allele Transmission is Germline or Chimeric and Transmission Reference does not Exist',), HDR_LINE, 0),
+    QcRule('TRANS_REF_NOT_GERMLINE', SKIP, ('transmission', 'transRef'), COST_CHECK, checkTransRefNotGermline,
+        ('Allele Transmission is not Germline or Chimeric and Transmission Reference does Exist',), HDR_LINE, 0),
+    QcRule('NO_MCL_TRANS_NOT_NA', SKIP, ('mcls', 'transmission'), COST_CHECK, checkNoMclTransNotNA,
+        ('No MCL and Allele Transmission != "Not Applicable"',), HDR_LINE, 0),
+    QcRule('MCL_TRANS_NA', SKIP, ('mcls', 'transmission'), COST_CHECK, checkMclTransNA,
+        ('MCL and Allele Transmission is "Not Applicable"',), HDR_LINE, 0),
+    QcRule('BAD_COLLECTION', SKIP, ('collection',), COST_LOOKUP, ValueCheck('collection', 'isCollection'),
+        ('Invalid Collection',), HDR_LINE, 0,
+        ('term', alleleLookups.COLLECTION_VOCAB)),
+    QcRule('NO_ORIG_REF', SKIP, ('origRef',), COST_CHECK, checkNoOrigRef,
+        ('Missing Original Reference',), HDR_LINE, 0),
+    QcRule('BAD_ORIG_REF', SKIP, ('origRef',), COST_LOOKUP, ValueCheck('origRef', 'isReference'),
+        ('Invalid Original Reference',), HDR_LINE, 0),
+    QcRule('BAD_TRANS_REF', SKIP, ('transRef',), COST_LOOKUP, ValueCheck('transRef', 'isReference'),
+        ('Invalid Transmission Reference',), HDR_LINE, 0),
+    QcRule('BAD_MOL_REF', SKIP, ('molRef',), COST_LOOKUP, ValueCheck('molRef', 'isReference'),
+        ('Invalid Molecular Reference',), HDR_LINE, 0),
+    QcRule('BAD_INDEX_REF', SKIP, ('idxRefs',), COST_LOOKUP, ValueCheck('idxRefs', 'isReference', 1),
+        ('Invalid Index Reference',), HDR_WIDE, 0),
+    QcRule('BAD_PCL', SKIP, ('pcl',), COST_LOOKUP, ValueCheck('pcl', 'isPcl'),
+        ('Invalid Parent Cell Line',), HDR_WIDE, 0,
+        ('pcl', None)),
+    QcRule('PCL_OSN_NO_NOTE', SKIP, ('pcl', 'genNote'), COST_CHECK, checkPclOsnNoNote,
+        ('PCL Other (see notes) with no General Note',), HDR_WIDE, 0),
+    QcRule('BAD_SOO', SKIP, ('soo',), COST_LOOKUP, ValueCheck('soo', 'isStrain'),
+        ('Invalid Strain of Origin',), HDR_WIDE, 0,
+        ('strain', None)),
+    QcRule('BAD_MCL', SKIP, ('mcls',), COST_LOOKUP, ValueCheck('mcls', 'isMcl', 1),
+        ('Invalid Mutant Cell Line',), HDR_WIDE, 0,
+        ('mcl', None)),
+    QcRule('MCL_MARKER_MISMATCH', SKIP, ('mcls', 'geneID'), COST_LOOKUP, checkMclMarkerMismatch,
+        ("MCL marker doesn't match input marker",), HDR_WIDE, 0),
+    QcRule('BAD_SUBTYPE', SKIP, ('subtypes',), COST_LOOKUP, ValueCheck('subtypes', 'isSubtype', 1),
+        ('Invalid Allele Subtype',), HDR_WIDE, 0,
+        ('term', alleleLookups.SUBTYPE_VOCAB)),
+    QcRule('BAD_MUTATION', SKIP, ('molMuts',), COST_LOOKUP, ValueCheck('molMuts', 'isMutation', 1),
+        ('Invalid Molecular Mutation',), HDR_WIDE, 0,
+        ('term', alleleLookups.MUTATION_VOCAB)),
+    QcRule('MUTATION_OTHER_NO_NOTE', SKIP, ('molMuts', 'molNote'), COST_LOOKUP, checkMutationOtherNoNote,
+        ('Molecular Mutation "Other" with no Molecular Note',), HDR_WIDE, 0),
+    QcRule('MCL_PCL_MISMATCH', SKIP, ('alleleType', 'mcls', 'pcl', 'soo'), COST_RESOLVE, checkMclPclMismatch,
+        ('Specified MCL where input PCL != DB PCL',), HDR_WIDE, 0),
+    QcRule('MCL_SOO_MISMATCH', SKIP, ('alleleType', 'mcls', 'pcl', 'soo'), COST_RESOLVE, checkMclSooMismatch,
+        ('Specified MCL where input SOO != DB PCL Strain',), HDR_WIDE, 0),
+    QcRule('NO_DERIVATION', SKIP, ('alleleType', 'mcls', 'pcl', 'soo'), COST_RESOLVE, checkNoDerivation,
+        ('MCL/PCL/SOO does not resolve to a MCL or Derivation in the DB',), HDR_WIDE, 0),
+    ]
+
+#
+# Purpose: clear the results of a QC run so another input file can be
+#       QC'd in the same process (the QC daemon)
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: modifies global variables
+# Throws: Nothing
+#
+
+def resetState():
+    global errorIndex, failedLineDict, inputAlleleDict, lineIndex
+    global hasSkipErrors, hasWarnErrors, inputValues, inputMclSet
+    global qcCacheLines, qcCacheSeen, linesRead, allelesToLoad, stageSeconds
+    global timingDict
+
+    errorIndex = []
+    failedLineDict = {}
+    inputAlleleDict = {}
+    lineIndex = {}
+    hasSkipErrors = 0
+    hasWarnErrors = 0
+    inputValues = {}
+    inputMclSet = set()
+    qcCacheLines = {}
+    qcCacheSeen = {}
+    linesRead = 0
+    allelesToLoad = 0
+    stageSeconds = {}
+    timingDict = {}
 
     return
 
-# end writeLoadReadyFile() -------------------------------
+# end resetState() -------------------------------
 
 #
-# Main
+# Purpose: determine the exit code of a QC run
+# Returns: 2 skip and warn errors, 3 skip errors, 4 warn errors, else 0
+# Assumes: the report has been written
+# Effects: Nothing
+# Throws: Nothing
+#
+
+def exitCode():
+
+    if hasSkipErrors and hasWarnErrors:
+        return 2
+    elif hasSkipErrors:
+        return 3
+    elif hasWarnErrors:
+        return 4
+
+    return 0
+
+# end exitCode() -------------------------------
+
+#
+# Purpose: write a frame of the QC daemon protocol - a line holding
+#       the frame name and data length, then the data
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: writes to fp
+# Throws: Nothing
+#
+
+def writeFrame(fp, name, data):
+
+    fp.write(('%s %d\n' % (name, len(data))).encode('utf-8'))
+    fp.write(data)
+
+    return
+
+# end writeFrame() -------------------------------
+
+#
+# Purpose: read the frames of the QC daemon protocol
+# Returns: a generator of (frame name, data) until end of file
+# Assumes: Nothing
+# Effects: reads fp
+# Throws: ValueError if the stream is truncated
+#
+
+def readFrames(fp):
+
+    while True:
+        header = fp.readline()
+        if not header:
+            return
+        name, length = str.split(header.decode('utf-8'))
+        data = fp.read(int(length))
+        if len(data) != int(length):
+            raise ValueError('truncated %s frame' % name)
+        yield name, data
+
+# end readFrames() -------------------------------
+
+#
+# Purpose: QC the input file with the QC daemon - sends the input file
+#       and writes the report and load ready file streamed back
+# Returns: the exit code of the QC run, or None if the daemon could not
+#       be reached or did not finish, in which case QC is run here
+# Assumes: files have been opened
+# Effects: writes the report and load ready file to the file system
+# Throws: Nothing
+#
+
+def runClient():
+
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(qcSocket)
+    except OSError:
+        print('QC daemon not listening on %s, running QC here' % qcSocket)
+        client.close()
+        return None
+
+    rc = None
+    try:
+        with open(inputFile, 'rb') as fp:
+            client.sendall(fp.read())
+        client.shutdown(socket.SHUT_WR)
+
+        fpResponse = client.makefile('rb')
+        for name, data in readFrames(fpResponse):
+            if name == 'rpt':
+                fpQcRpt.write(data.decode('utf-8'))
+            elif name == 'load':
+                fpLoadReady.write(data.decode('utf-8'))
+            elif name == 'results':
+                if fpResults:
+                    fpResults.write(data.decode('utf-8'))
+            elif name == 'log':
+                print(data.decode('utf-8'), end='')
+            elif name == 'exit':
+                rc = int(data)
+    except (OSError, ValueError) as e:
+        print('QC daemon failed: %s, running QC here' % e)
+        rc = None
+    finally:
+        client.close()
+
+    if rc is None:
+        # start over, the files may hold part of the daemon's results
+        fpQcRpt.seek(0)
+        fpQcRpt.truncate()
+        fpLoadReady.seek(0)
+        fpLoadReady.truncate()
+        if fpResults:
+            fpResults.seek(0)
+            fpResults.truncate()
+
+    return rc
+
+# end runClient() -------------------------------
+
+#
+# Purpose: run a stage of the QC run, timing it
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: runs the stage, records its seconds
+# Throws: Nothing
+#
+
+def runStage(name, stage):
+
+    print('%s(): %s' % (name, time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time()))))
+    sys.stdout.flush()
+    startWall, startCpu = time.perf_counter(), time.process_time()
+    stage()
+    stageSeconds[name] = time.perf_counter() - startWall
+    addTiming('stage', name, stageSeconds[name], time.process_time() - startCpu)
+
+    return
+
+# end runStage() -------------------------------
+
+#
+# Purpose: add to the time taken by a stage, lookup, rule or branch
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: modifies global variables
+# Throws: Nothing
+#
+
+def addTiming(section, name, wall, cpu, calls = 1, rows = 0):
+
+    total = timingDict.setdefault((section, name), [0, 0, 0.0, 0.0])
+    total[0] += calls
+    total[1] += rows
+    total[2] += wall
+    total[3] += cpu
+
+    return
+
+# end addTiming() -------------------------------
+
+#
+# Purpose: run a rule's check on a line, timing it
+# Returns: the check's error details
+# Assumes: Nothing
+# Effects: modifies global variables
+# Throws: Nothing
 #
-print('checkArgs(): %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
-sys.stdout.flush()
-checkArgs()
 
-print('init(): %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
-sys.stdout.flush()
-init()
+def timedCheck(rule, fields):
+
+    startWall, startCpu = time.perf_counter(), time.thread_time()
+    details = rule.check(fields)
+    addTiming('rule', rule.code, time.perf_counter() - startWall, time.thread_time() - startCpu, rows = len(details))
+
+    return details
+
+# end timedCheck() -------------------------------
+
+#
+# Purpose: print the time taken per stage, per lookup (with its query
+#       and row counts), per rule and per qcMCL() branch, slowest first
+#       within each section
+# Returns: Nothing
+# Assumes: QC has been run
+# Effects: writes to stdout
+# Throws: Nothing
+#
 
-print('runQcChecks(): %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
-sys.stdout.flush()
-runQcChecks()
+def writeTimingReport():
 
-print('writeReport(): %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
-writeReport()
+    if lookups is not None:
+        for name in lookups.stats:
+            queries, rows, wall, cpu = lookups.stats[name]
+            timingDict[('lookup', name)] = [queries, rows, wall, cpu]
 
-print('writeLoadReadyFile(): %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
-writeLoadReadyFile()
+    print(CRT + '%-8s  %-24s  %10s  %10s  %10s  %10s' % ('Section', 'Name', 'Calls', 'Rows/Errs', 'Wall s', 'CPU s'))
+    print('%s  %s  %s  %s  %s  %s' % (8*'-', 24*'-', 10*'-', 10*'-', 10*'-', 10*'-'))
+    for section in ['stage', 'lookup', 'rule', 'qcMCL']:
+        names = [n for (sec, n) in timingDict if sec == section]
+        if section != 'stage':
+            names.sort(key=lambda n: -timingDict[(section, n)][2])
+        for name in names:
+            calls, rows, wall, cpu = timingDict[(section, name)]
+            print('%-8s  %-24s  %10d  %10d  %10.3f  %10.3f' % (section, name, calls, rows, wall, cpu))
+    sys.stdout.flush()
 
-print('closeFiles(): %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
-sys.stdout.flush()
-closeFiles()
+    return
 
-db.useOneConnection(0)
-print('done: %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
-if hasSkipErrors and hasWarnErrors:
-    sys.exit(2)
-elif hasSkipErrors: 
-    sys.exit(3)
-elif hasWarnErrors:
-    sys.exit(4)
-else:
-    sys.exit(0)
+# end writeTimingReport() -------------------------------
 
+#
+# Purpose: run QC on the input file, by the QC daemon if one is
+#       configured and listening
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: see the Outputs, exits with the exit code
+# Throws: Nothing
+#
+
+def main():
+
+    print('checkArgs(): %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
+    sys.stdout.flush()
+    checkArgs()
+
+    if qcSocket:
+        openFiles()
+        rc = runClient()
+        if rc is not None:
+            closeFiles()
+            print('done by QC daemon: %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
+            sys.exit(rc)
+        closeFiles()
+
+    runStage('init', init)
+    runStage('runQcChecks', runQcChecks)
+    runStage('writeReport', writeReport)
+    writeResultsSummary()
+
+    print('closeFiles(): %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
+    sys.stdout.flush()
+    closeFiles()
+
+    if qcTiming:
+        writeTimingReport()
+
+    db.useOneConnection(0)
+    print('done: %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
+    sys.exit(exitCode())
+
+# end main() -------------------------------
+
+#
+# Main
+#
+if __name__ == '__main__':
+    main()
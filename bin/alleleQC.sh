@@ -117,6 +117,10 @@ if [ ${LIVE_RUN} -eq 0 ]
 then
 	QC_RPT=${CURRENTDIR}/`basename ${QC_RPT}`
 	QC_LOGFILE=${CURRENTDIR}/`basename ${QC_LOGFILE}`
+	if [ "${QC_RESULTS}" != "" ]
+	then
+	    QC_RESULTS=${CURRENTDIR}/`basename ${QC_RESULTS}`
+	fi
 
 fi
 
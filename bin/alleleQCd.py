@@ -0,0 +1,270 @@
+
+#  alleleQCd.py
+###########################################################################
+#
+#  Purpose:
+#
+#	This script is a resident QC service for curator allele input
+#	    files. It keeps the lookups loaded, refreshing them in the
+#	    background when the database changes, and QCs each input file
+#	    submitted on its Unix socket by alleleQC.py
+#
+#  Usage:
+#
+#      alleleQCd.py
+#
+#  Env Vars:
+#
+#      QC_SOCKET - path of the Unix socket to listen on
+#      QC_SOCKET_MODE - octal permissions of the socket
+#      QC_DAEMON_REFRESH - seconds between checks that the lookups
+#          are still fresh
+#      and the QC settings of the configuration file
+#
+#  Inputs:
+#
+#      - curator allele input files, sent on the socket
+#
+#  Outputs:
+#
+#      - for each input file, streamed back on the socket in frames
+#        (see alleleQC.writeFrame): 'log' messages, the QC report
+#        ('rpt'), the load ready file ('load'), the QC results
+#        ('results') and the QC exit code ('exit')
+#
+#  Exit Codes:
+#
+#      1:  An exception occurred
+#
+#  Assumes:
+#
+#      Only QC results are written and the database is only read, but
+#      the service holds a database connection, so only the users the
+#      QC_SOCKET_MODE permissions admit (by default the daemon's user
+#      and group) may submit a file
+#
+#  Implementation:
+#
+#      This script will perform following steps:
+#
+#      1) Load the full-table lookups
+#      2) Start a thread that re-probes the database every
+#         QC_DAEMON_REFRESH seconds and reloads the lookups if the
+#         database changed
+#      3) Listen on QC_SOCKET; for each file submitted run the
+#         alleleQC.py checks in a scratch directory with a copy of the
+#         lookups and stream the results back. One file is QC'd at a
+#         time, and not while the lookups are being refreshed
+#
+###########################################################################
+
+import sys
+import os
+import time
+import shutil
+import socket
+import socketserver
+import tempfile
+import threading
+import traceback
+import db
+import alleleLookups
+import alleleQC
+
+#
+#  CONSTANTS
+#
+
+# size of the frames the results are streamed back in
+FRAME_SIZE = 65536
+
+#
+#  GLOBALS
+#
+
+qcSocket = os.getenv('QC_SOCKET')
+qcSocketMode = int(os.getenv('QC_SOCKET_MODE', '660'), 8)
+refreshInterval = int(os.getenv('QC_DAEMON_REFRESH', '300'))
+
+# the full-table lookups, replaced when the database changes
+baseLookups = None
+
+# held while a file is QC'd or the lookups are refreshed; both use the
+# db module's connection and the alleleQC globals
+qcLock = threading.Lock()
+
+#
+# Purpose: load the full-table lookups
+# Returns: the Lookups
+# Assumes: a database connection exists
+# Effects: queries a database, reads/writes the lookup snapshot
+# Throws: Nothing
+#
+
+def loadBaseLookups():
+
+    lookups = alleleLookups.Lookups(alleleQC.lookupThreads)
+    if alleleQC.lookupCacheFile:
+        lookups.loadCached(alleleQC.lookupCacheFile)
+    else:
+        lookups.load()
+        lookups.probe()
+
+    print('lookups loaded, version %s: %s' % (lookups.version, time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time()))))
+    sys.stdout.flush()
+
+    return lookups
+
+# end loadBaseLookups() -------------------------------
+
+#
+# Purpose: background thread - reload the lookups whenever the
+#       freshness probes show the database changed
+# Returns: Nothing
+# Assumes: a database connection exists
+# Effects: queries a database, modifies global variables
+# Throws: Nothing
+#
+
+def refreshLookups():
+    global baseLookups
+
+    while True:
+        time.sleep(refreshInterval)
+        with qcLock:
+            try:
+                probe = alleleLookups.Lookups()
+                probe.probe()
+                if probe.version != baseLookups.version:
+                    baseLookups = loadBaseLookups()
+            except:
+                print('lookup refresh failed, keeping the current lookups')
+                traceback.print_exc()
+                sys.stdout.flush()
+
+# end refreshLookups() -------------------------------
+
+#
+# Purpose: QC one input file with the alleleQC.py checks
+# Returns: the QC exit code
+# Assumes: qcLock is held, input file is in workDir
+# Effects: writes the report and load ready file to workDir
+# Throws: Nothing
+#
+
+def runQc(workDir):
+
+    alleleQC.resetState()
+    alleleQC.inputFile = os.path.join(workDir, 'input.txt')
+    alleleQC.qcRptFile = os.path.join(workDir, 'qc.rpt')
+    alleleQC.loadReadyFile = os.path.join(workDir, 'load.txt')
+    if (alleleQC.qcResultsFile or '').endswith('.tsv'):
+        alleleQC.qcResultsFile = os.path.join(workDir, 'results.tsv')
+    else:
+        alleleQC.qcResultsFile = os.path.join(workDir, 'results.json')
+
+    try:
+        alleleQC.openFiles()
+        alleleQC.initRules()
+        alleleQC.scanInput()
+        alleleQC.lookups = baseLookups.copyForInput()
+        alleleQC.loadInputLookups()
+        alleleQC.loadQcCache()
+        alleleQC.runStage('runQcChecks', alleleQC.runQcChecks)
+        alleleQC.runStage('writeReport', alleleQC.writeReport)
+        alleleQC.writeResultsSummary()
+        if alleleQC.qcTiming:
+            alleleQC.writeTimingReport()
+        rc = alleleQC.exitCode()
+    except SystemExit as e:
+        rc = e.code
+    except:
+        traceback.print_exc()
+        rc = 1
+
+    for fp in (alleleQC.fpInput, alleleQC.fpLoadReady, alleleQC.fpQcRpt, alleleQC.fpResults):
+        if fp is not None:
+            fp.close()
+    alleleQC.fpResults = None
+
+    return rc
+
+# end runQc() -------------------------------
+
+class QcHandler(socketserver.StreamRequestHandler):
+    #
+    # Is: the handler of one QC request
+    # Has: the client connection
+    # Does: reads the input file up to end of file, QCs it and streams
+    #       back the results
+    #
+    def handle(self):
+
+        workDir = tempfile.mkdtemp(prefix='alleleQCd.')
+        try:
+            with open(os.path.join(workDir, 'input.txt'), 'wb') as fp:
+                shutil.copyfileobj(self.rfile, fp)
+
+            print('QC request: %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
+            sys.stdout.flush()
+            with qcLock:
+                rc = runQc(workDir)
+                version = baseLookups.version
+
+            alleleQC.writeFrame(self.wfile, 'log', ('QC run by daemon, lookups version %s\n' % version).encode('utf-8'))
+            for name, path in [('rpt', alleleQC.qcRptFile), ('load', alleleQC.loadReadyFile), ('results', alleleQC.qcResultsFile)]:
+                if not os.path.exists(path):
+                    continue
+                with open(path, 'rb') as fp:
+                    for data in iter(lambda: fp.read(FRAME_SIZE), b''):
+                        alleleQC.writeFrame(self.wfile, name, data)
+            alleleQC.writeFrame(self.wfile, 'exit', str(rc).encode('utf-8'))
+        except OSError as e:
+            print('QC request failed: %s' % e)
+        finally:
+            shutil.rmtree(workDir, ignore_errors = True)
+
+        return
+
+#
+# Purpose: load the lookups and serve QC requests on the socket until
+#       killed
+# Returns: Nothing
+# Assumes: Nothing
+# Effects: creates connection to a database, creates and removes the
+#       socket
+# Throws: Nothing
+#
+
+def main():
+    global baseLookups
+
+    db.useOneConnection(1)
+    alleleQC.fpInput = alleleQC.fpQcRpt = None
+
+    baseLookups = loadBaseLookups()
+    threading.Thread(target = refreshLookups, daemon = True).start()
+
+    if os.path.exists(qcSocket):
+        os.remove(qcSocket)
+    server = socketserver.UnixStreamServer(qcSocket, QcHandler)
+    os.chmod(qcSocket, qcSocketMode)
+
+    print('listening on %s: %s' % (qcSocket, time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time()))))
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        os.remove(qcSocket)
+        db.useOneConnection(0)
+
+    return
+
+# end main() -------------------------------
+
+#
+# Main
+#
+if __name__ == '__main__':
+    main()
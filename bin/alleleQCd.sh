@@ -0,0 +1,69 @@
+#!/bin/sh
+#
+#  alleleQCd.sh
+###########################################################################
+#
+#  Purpose:
+#
+#      This script is a wrapper around the resident QC service for the
+#	Curator Allele load (alleleQCd.py)
+#
+#  Usage:
+#
+#      alleleQCd.sh
+#
+#  Env Vars:
+#
+#      See the configuration file
+#
+#  Outputs:
+#
+#      - Log file (${QC_DAEMON_LOG})
+#
+#  Exit Codes:
+#
+#      1:  Configuration error or QC_SOCKET not set
+#
+#  Assumes:  Nothing
+#
+#  Implementation:
+#
+#      This script will perform following steps:
+#
+#      1) Validate & source the configuration files to establish the environment
+#      2) Start alleleQCd.py in the background, listening on ${QC_SOCKET}
+#
+#  Notes:  alleleQC.py (and so runAlleleQC and alleleQC.sh) use the
+#	service whenever QC_SOCKET is set and it is listening, and run QC
+#	themselves otherwise
+#
+###########################################################################
+BINDIR=`dirname $0`
+
+CONFIG=`cd ${BINDIR}/..; pwd`/curatoralleleload.config
+
+#
+# Make sure the configuration file exists and source it.
+#
+if [ -f ${CONFIG} ]
+then
+    . ${CONFIG}
+else
+    echo "Missing configuration file: ${CONFIG}"
+    exit 1
+fi
+
+if [ "${QC_SOCKET}" = "" ]
+then
+    echo "QC_SOCKET is not set in ${CONFIG}"
+    exit 1
+fi
+
+#
+# Start the QC service.
+#
+date >> ${QC_DAEMON_LOG}
+echo "Start the QC service on ${QC_SOCKET}" >> ${QC_DAEMON_LOG}
+nohup ${PYTHON} ${CURATORALLELELOAD}/bin/alleleQCd.py >> ${QC_DAEMON_LOG} 2>&1 &
+
+exit 0
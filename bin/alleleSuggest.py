@@ -0,0 +1,92 @@
+
+#  alleleSuggest.py
+###########################################################################
+#
+#  Purpose:
+#
+#	"Did you mean" suggestions for invalid values in a curator allele
+#	    input file - the closest valid values of a lookup
+#
+#  Usage:
+#
+#      import alleleSuggest
+#
+#      index = alleleSuggest.SuggestIndex(lookups.validValues('strain'))
+#      index.suggest('C57BL/6X')    # ['C57BL/6', 'C57BL/6N', ...]
+#
+#  Implementation:
+#
+#      Each valid value is indexed by its character trigrams (lower
+#      case, padded so the start of a value counts). A query only
+#      compares against the values sharing the most trigrams with it,
+#      so a suggestion stays fast against the full strain and cell line
+#      tables. Those candidates are ranked by difflib's similarity ratio
+#      and the best that are close enough are returned.
+#
+#      An index is built once per lookup, when the first suggestion is
+#      asked of it.
+#
+#  History:
+#
+# 10/16/2026
+#       - initial version
+#
+###########################################################################
+
+import difflib
+import heapq
+
+#
+#  CONSTANTS
+#
+
+# values sharing the most trigrams with the query that are ranked
+CANDIDATES = 50
+
+# suggestions returned, and the least similarity ratio of a suggestion
+SUGGESTIONS = 3
+MIN_RATIO = 0.6
+
+class SuggestIndex:
+    #
+    # Is: a trigram index over the valid values of a lookup
+    # Has: the values, and trigram : positions of the values holding it
+    # Does: suggests the closest values to an invalid value
+    #
+    def __init__(self, values):
+
+        self.values = sorted(values)
+        self.index = {}
+        for i, value in enumerate(self.values):
+            for gram in trigrams(value):
+                self.index.setdefault(gram, []).append(i)
+
+    #
+    # Purpose: find the valid values closest to 'value'
+    # Returns: list of at most SUGGESTIONS values, closest first
+    #
+    def suggest(self, value):
+
+        shared = {}
+        for gram in trigrams(value):
+            for i in self.index.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+
+        query = value.lower()
+        ranked = []
+        for i in heapq.nlargest(CANDIDATES, shared, key=shared.get):
+            ratio = difflib.SequenceMatcher(None, query, self.values[i].lower()).ratio()
+            if ratio >= MIN_RATIO:
+                ranked.append((-ratio, self.values[i]))
+        ranked.sort()
+
+        return [v for ratio, v in ranked[:SUGGESTIONS]]
+
+#
+# Purpose: the character trigrams of a value
+# Returns: set of trigrams
+#
+def trigrams(value):
+
+    padded = '  %s ' % value.lower()
+    return set([padded[i:i + 3] for i in range(len(padded) - 2)])
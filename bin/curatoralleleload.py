@@ -38,7 +38,13 @@
 #       field 20: Molecular Mutations, multivalued '|' delimited
 #       field 21: Parent Cell Line
 #       field 22: Strain of Origin Name
-#       field 23: Mutant Cell Lines - multivalued '|' delimited
+#       field 23: Mutant Cell Line keys - multivalued '|' delimited
+#       field 24: Derivation key of a new Not Specified Mutant Cell Line
+#
+#       followed, in files written by this version of alleleQC.py, by the
+#       database keys QC resolved fields 3-8, 22, 14-17, 19 and 20 to
+#       (see keyColumnList); fields 25-38. A key field that is empty, or
+#       a file of 24 fields, is resolved by name
 #
 # Outputs:
 #
@@ -54,6 +60,10 @@
 #       All_CellLine                    mutant cell line only
 #       All_Allele_CellLine             association between an Allele and a Cell Line
 #
+#       With LOAD_BACKEND=copy the rows are streamed into the database with
+#       COPY FROM STDIN in one transaction instead, and only written to the
+#       BCP files if LOAD_TEE_BCP is 'true'
+#
 #       Diagnostics file - for verification calls to loadlib and sourceloadlib
 #       Error file - for verification calls to loadlib and sourceloadlib
 #
@@ -78,7 +88,11 @@ import db
 import mgi_utils
 import loadlib
 import sourceloadlib
+import io
 import subprocess
+import concurrent.futures
+import psycopg2
+import alleleLookups
 
 # globals
 
@@ -93,6 +107,13 @@ BCP_COMMAND = os.getenv('PG_DBUTILS') + '/bin/bcpin.csh'
 # Default is 'false'
 DEBUG = os.getenv('LOG_DEBUG')
 
+# 'bcp' to load the bcp files with bcpin.csh, 'copy' to stream the rows
+# into the database with COPY FROM STDIN in one transaction
+loadBackend = os.getenv('LOAD_BACKEND', 'bcp')
+
+# if 'true' the copy backend also writes the rows to the bcp files
+teeBcp = os.getenv('LOAD_TEE_BCP', 'true') == 'true'
+
 CRT = '\n'
 
 #
@@ -138,6 +159,53 @@ annotFileName = outputDir + '/' + annotTable + '.bcp'
 mclAssocFileName =  outputDir + '/' + mclAssocTable + '.bcp'
 mclFileName = outputDir + '/' + mclTable + '.bcp'
 
+bcpFileDict = {alleleTable : alleleFileName, mutationTable : mutationFileName,
+    refTable : refFileName, accTable : accFileName, noteTable : noteFileName,
+    synonymTable : synonymFileName, annotTable : annotFileName,
+    mclAssocTable : mclAssocFileName, mclTable : mclFileName}
+
+#
+# the tables in load order, and table : the tables that must be loaded
+# before it; tables whose dependencies are loaded may load concurrently
+#
+tableList = [alleleTable, mutationTable, refTable, accTable, synonymTable,
+    noteTable, annotTable, mclTable, mclAssocTable]
+
+tableDependsDict = {
+    alleleTable : [],
+    mclTable : [],
+    mutationTable : [alleleTable],
+    refTable : [alleleTable],
+    accTable : [alleleTable],
+    synonymTable : [alleleTable],
+    noteTable : [alleleTable],
+    annotTable : [alleleTable],
+    mclAssocTable : [alleleTable, mclTable],
+    }
+
+# max number of tables loaded at a time, each on its own connection
+loadThreads = int(os.getenv('LOAD_THREADS', '1'))
+
+# table : CopyBuffer of its rows, for the copy backend
+copyBufferDict = {}
+
+#
+# the sequence keying each table but ACC_Accession, as (sequence, table);
+# setPrimaryKeys() reserves the keys the load needs from each, so the
+# sequences need no reset after the load
+#
+keySequenceList = [('all_allele_seq', alleleTable),
+    ('mgi_reference_assoc_seq', refTable),
+    ('mgi_note_seq', noteTable),
+    ('mgi_synonym_seq', synonymTable),
+    ('all_allele_mutation_seq', mutationTable),
+    ('all_allele_cellline_seq', mclAssocTable),
+    ('voc_annot_seq', annotTable),
+    ('all_cellline_seq', mclTable)]
+
+# table : KeyBlock of the keys reserved for its rows
+keyBlockDict = {}
+
 #
 # log file paths 
 #
@@ -191,10 +259,155 @@ isMixed = 0             # ALL_Allele.isMixed
 # MCL global attributes
 esCellKey = 3982968
 
+# Allele vocabularies resolved by the load
+# 37 (Allele Status), 38 (Allele Type), 35 (Allele Inheritance Mode),
+# 61 (Allele Transmission), 92 (Allele Collection), 93 (Allele Subtype),
+# 36 (Allele Molecular Mutation)
+vocabKeyList = [37, 38, 35, 61, 92, 93, 36]
+
+# (_Vocab_key, term) : _Term_key for the allele vocabularies
+termKeyDict = {}
+
+#
+# the queries resolving the distinct values of the input file to keys,
+# or checking the keys alleleQC.py resolved them to
+# name: (query, column the values are filtered on, column the keys are
+#        filtered on, value column, key column)
+#
+keyQueries = {
+    'marker' : ('''select a.accid, a._object_key
+                from acc_accession a
+                where a._mgitype_key = 2
+                and a._logicaldb_key = 1
+                and a.prefixPart = 'MGI:'
+                and a.preferred = 1''', 'a.accid', 'a._object_key', 'accid', '_object_key'),
+
+    'user' : ('''select login, _user_key
+                from mgi_user''', 'login', '_user_key', 'login', '_user_key'),
+
+    'term' : ('''select _vocab_key, term, _term_key
+                from voc_term
+                where _vocab_key in (%s)''' % ', '.join(map(str, vocabKeyList)), None, '_term_key', 'term', '_term_key'),
+
+    'reference' : ('''select accid, _object_key
+                from acc_accession
+                where _mgitype_key = 1
+                and _logicaldb_key = 1
+                and prefixPart = 'J:'
+                and preferred = 1''', 'accid', '_object_key', 'accid', '_object_key'),
+
+    'strain' : ('''select strain, _strain_key
+                from prb_strain''', 'strain', '_strain_key', 'strain', '_strain_key'),
+    }
+
+# name : {value : key} for the values of the input file
+inputKeyDict = {}
+
+# set by curatoralleleloadPipeline.py, which QC'd the input file in
+# this process: the keys carried in the file are this run's lookups, so
+# they are used without being checked against the database
+trustCarriedKeys = 0
+
+#
+# the key fields written by alleleQC.py after the 24 load ready fields
+# (see alleleQC.loadKeys()), as (index of the key field, key query name,
+# index of the field it resolves, _Vocab_key of a term field);
+# multivalued fields carry '|' delimited keys
+#
+keyColumnList = [
+    (24, 'marker', 2, None),
+    (25, 'user', 3, None),
+    (26, 'term', 4, 37),
+    (27, 'term', 5, 38),
+    (28, 'term', 6, 35),
+    (29, 'term', 7, 61),
+    (30, 'term', 8, 92),
+    (31, 'strain', 21, None),
+    (32, 'reference', 13, None),
+    (33, 'reference', 14, None),
+    (34, 'reference', 15, None),
+    (35, 'reference', 16, None),
+    (36, 'term', 18, 93),
+    (37, 'term', 19, 36),
+    ]
+keyColumnCount = 38
+
 NS = 'Not Specified'
 
 loaddate = loadlib.loaddate
 
+class KeyBlock:
+    #
+    # Is: the keys reserved from a sequence for the rows of one table
+    # Has: the sequence, the reserved keys in ascending order and the
+    #      number handed out
+    # Does: reserves the keys with one nextval() per key in a single
+    #       query, hands them out in order with next(). The keys are
+    #       not assumed contiguous, so a load running alongside other
+    #       users of the sequence never reuses their keys
+    #
+    def __init__(self, sequence, count):
+
+        self.sequence = sequence
+        self.keys = []
+        self.used = 0
+
+        if count > 0:
+            results = db.sql(''' select nextval('%s') as key from generate_series(1, %d) ''' % (sequence, count), 'auto')
+            self.keys = sorted([r['key'] for r in results])
+
+    def next(self):
+        # the next reserved key, None once they are all handed out
+
+        if self.used == len(self.keys):
+            return None
+
+        self.used += 1
+        return self.keys[self.used - 1]
+
+    def describe(self):
+        # the reserved keys, as ranges of consecutive keys
+
+        ranges = []
+        for key in self.keys:
+            if ranges and ranges[-1][1] == key - 1:
+                ranges[-1][1] = key
+            else:
+                ranges.append([key, key])
+
+        rangeList = []
+        for first, last in ranges:
+            if first == last:
+                rangeList.append('%s' % first)
+            else:
+                rangeList.append('%s-%s' % (first, last))
+
+        return '%s: %d keys reserved %s' % (self.sequence, len(self.keys), ', '.join(rangeList))
+
+class CopyBuffer(io.StringIO):
+    #
+    # Is: the rows of one table for the copy backend
+    # Has: the rows, in bcp format, and the bcp file they are also
+    #      written to if LOAD_TEE_BCP is 'true'
+    # Does: write() a row; close() closes the bcp file but keeps the
+    #       rows until they are copied into the database
+    #
+    def __init__(self, teeFile = None):
+
+        io.StringIO.__init__(self)
+        self.teeFile = teeFile
+
+    def write(self, s):
+
+        if self.teeFile:
+            self.teeFile.write(s)
+        return io.StringIO.write(self, s)
+
+    def close(self):
+
+        if self.teeFile:
+            self.teeFile.close()
+
 def exit(
     status,          # numeric exit status (integer)
     message = None   # exit message (str.
@@ -249,47 +462,47 @@ def initialize():
         exit(1, 'Could not open file %s\n' % inputFileName)
 
     try:
-        fpAlleleFile = open(alleleFileName, 'w')
+        fpAlleleFile = openBcpFile(alleleFileName)
     except:
         exit(1, 'Could not open file %s\n' % alleleFileName)
 
     try:
-        fpMutationFile = open(mutationFileName, 'w')
+        fpMutationFile = openBcpFile(mutationFileName)
     except:
         exit(1, 'Could not open file %s\n' % mutationFileName)
 
     try:
-        fpRefFile = open(refFileName, 'w')
+        fpRefFile = openBcpFile(refFileName)
     except:
         exit(1, 'Could not open file %s\n' % refFileName)
 
     try:
-        fpAccFile = open(accFileName, 'w')
+        fpAccFile = openBcpFile(accFileName)
     except:
         exit(1, 'Could not open file %s\n' % accFileName)
 
     try:
-        fpNoteFile = open(noteFileName, 'w')
+        fpNoteFile = openBcpFile(noteFileName)
     except:
         exit(1, 'Could not open file %s\n' % noteFileName)
 
     try:
-        fpSynonymFile = open(synonymFileName, 'w')
+        fpSynonymFile = openBcpFile(synonymFileName)
     except:
         exit(1, 'Could not open file %s\n' % synonymFileName)
 
     try:
-        fpAnnotFile = open(annotFileName, 'w')
+        fpAnnotFile = openBcpFile(annotFileName)
     except:
         exit(1, 'Could not open file %s\n' % annotFileName)
 
     try:
-        fpMutantFile = open(mclAssocFileName, 'w')
+        fpMutantFile = openBcpFile(mclAssocFileName)
     except:
         exit(1, 'Could not open file %s\n' % mclAssocFileName)
 
     try:
-        fpMclFile = open(mclFileName, 'w')
+        fpMclFile = openBcpFile(mclFileName)
     except:
         exit(1, 'Could not open file %s\n' % mclFileName)
 
@@ -304,6 +517,22 @@ def initialize():
 
     return 0
 
+def openBcpFile(fileName):
+    # Purpose: open the file the rows of a table are written to
+    # Returns: the bcp file, or a CopyBuffer for the copy backend
+    # Assumes: Nothing
+    # Effects: creates fileName unless the copy backend is used without
+    #     LOAD_TEE_BCP; debug runs always write the bcp files
+    # Throws: IOError if fileName can't be opened
+
+    if loadBackend != 'copy' or DEBUG == 'true':
+        return open(fileName, 'w')
+
+    if teeBcp:
+        return CopyBuffer(open(fileName, 'w'))
+
+    return CopyBuffer()
+
 def closeFiles():
     # Purpose: Close all file descriptors
     # Returns: 1 if error, else 0
@@ -326,47 +555,325 @@ def closeFiles():
     return 0
 
 
+def countRows():
+    # Purpose: count the rows each table keyed by a sequence needs for
+    #     the input file, as processFile() would write them if every
+    #     value resolves
+    # Returns: dict of table : number of rows
+    # Assumes: fpInputFile is open
+    # Effects: rewinds fpInputFile
+    # Throws: Nothing
+
+    rowCountDict = {}
+    for sequence, table in keySequenceList:
+        rowCountDict[table] = 0
+
+    def count(table, values):
+        if values:
+            rowCountDict[table] += len(values.split('|'))
+
+    for line in fpInputFile.readlines():
+        tokens = line[:-1].split('\t')
+        if len(tokens) < 24:
+            continue    # reported by processFile()
+
+        rowCountDict[alleleTable] += 1
+        for note in tokens[9:13]:
+            if note:
+                rowCountDict[noteTable] += 1
+        for jNums in tokens[13:17]:
+            count(refTable, jNums)
+        count(synonymTable, tokens[17])
+        count(annotTable, tokens[18])
+        count(mutationTable, tokens[19])
+        if tokens[22]:
+            count(mclAssocTable, tokens[22])
+        elif tokens[23]:
+            rowCountDict[mclTable] += 1
+            rowCountDict[mclAssocTable] += 1
+
+    fpInputFile.seek(0)
+
+    return rowCountDict
+
 def setPrimaryKeys():
-    # Purpose: sets global primary key variables
+    # Purpose: sets global primary key variables; reserves from each
+    #     table's sequence the keys of the rows the load needs
     # Returns: 1 if error, else 0
     # Assumes: database connection exists
-    # Effects: Nothing
+    # Effects: advances the sequences, writes the reserved keys to the
+    #     diagnostics file
     # Throws: Nothing
 
     global alleleKey, refAssocKey, accKey, noteKey, mgiKey, synonymKey, alleleMutationKey, mutantAssocKey, annotKey, mclKey
 
-    results = db.sql(''' select nextval('all_allele_seq') as maxKey ''', 'auto')
-    alleleKey = results[0]['maxKey']
+    rowCountDict = countRows()
 
-    results = db.sql(''' select nextval('mgi_reference_assoc_seq') as maxKey ''', 'auto')
-    refAssocKey = results[0]['maxKey']
+    for sequence, table in keySequenceList:
+        keyBlockDict[table] = KeyBlock(sequence, rowCountDict[table])
+        fpDiagFile.write('%s\n' % keyBlockDict[table].describe())
 
+    alleleKey = keyBlockDict[alleleTable].next()
+    refAssocKey = keyBlockDict[refTable].next()
+    noteKey = keyBlockDict[noteTable].next()
+    synonymKey = keyBlockDict[synonymTable].next()
+    alleleMutationKey = keyBlockDict[mutationTable].next()
+    mutantAssocKey = keyBlockDict[mclAssocTable].next()
+    annotKey = keyBlockDict[annotTable].next()
+    mclKey = keyBlockDict[mclTable].next()
+
+    # ACC_Accession has no sequence; its keys follow the max key, and the
+    # MGI IDs follow ACC_AccessionMax, which ACC_setMax() updates
     results = db.sql('select max(_Accession_key) + 1 as maxKey from ACC_Accession', 'auto')
     accKey = results[0]['maxKey']
 
-    results = db.sql(''' select nextval('mgi_note_seq') as maxKey ''', 'auto')
-    noteKey = results[0]['maxKey']
-
     results = db.sql(''' select max(maxNumericPart) + 1 as maxKey from ACC_AccessionMax where prefixPart = '%s' ''' % (mgiPrefix), 'auto')
     mgiKey = results[0]['maxKey']
 
-    results = db.sql(''' select nextval('mgi_synonym_seq')as maxKey ''', 'auto')
-    synonymKey = results[0]['maxKey']
-    
-    results = db.sql(''' select nextval('all_allele_mutation_seq') as maxKey ''', 'auto')
-    alleleMutationKey = results[0]['maxKey']
+    return 0
 
-    results = db.sql(''' select nextval('all_allele_cellline_seq') as maxKey ''', 'auto')
-    mutantAssocKey = results[0]['maxKey']
+def loadTermKeys():
+    # Purpose: load the term keys of the allele vocabularies, so
+    #     terms are resolved without a query per field
+    # Returns: 1 if error,  else 0
+    # Assumes: database connection exists
+    # Effects: sets global termKeyDict
+    # Throws: Nothing
 
-    results = db.sql(''' select nextval('voc_annot_seq') as maxKey ''', 'auto')
-    annotKey = results[0]['maxKey']
+    results = db.sql(keyQueries['term'][0], 'auto')
 
-    results = db.sql(''' select nextval('all_cellline_seq') as maxKey ''', 'auto')
-    mclKey = results[0]['maxKey']
+    for r in results:
+        termKeyDict[(r['_vocab_key'], r['term'])] = r['_term_key']
 
     return 0
 
+def verifyTerm(vocabKey, term, lineNum):
+    # Purpose: resolve 'term' of vocabulary 'vocabKey' to its term key
+    # Returns: the term key, 0 if the term is invalid
+    # Assumes: loadInputKeys() has been called
+    # Effects: a term not in termKeyDict is verified by loadlib, which
+    #     writes the error to fpErrorFile
+    # Throws: Nothing
+
+    termKey = termKeyDict.get((vocabKey, term))
+    if termKey is None:
+        termKey = loadlib.verifyTerm('', vocabKey, term, lineNum, fpErrorFile)
+
+    return termKey
+
+def loadInputKeys():
+    # Purpose: resolve the gene IDs, logins, terms, J: numbers and
+    #     strains of the input file to keys. The keys alleleQC.py
+    #     carried in the file are checked with one query per key set;
+    #     the values without a key are resolved with one query per set
+    # Returns: 1 if error,  else 0
+    # Assumes: database connection exists, fpInputFile is open
+    # Effects: sets global inputKeyDict and termKeyDict, rewinds
+    #     fpInputFile, writes the carried keys that do not match their
+    #     value to the diagnostics file
+    # Throws: Nothing
+
+    # name : set of values to resolve by name
+    valueDict = {'marker' : set(), 'user' : set(), 'reference' : set(),
+        'strain' : set()}
+    resolveTerms = 0
+
+    # name : {carried key : set of values}; a term value is
+    # (_Vocab_key, term)
+    carriedDict = {'marker' : {}, 'user' : {}, 'term' : {}, 'reference' : {},
+        'strain' : {}}
+
+    for line in fpInputFile.readlines():
+        tokens = line[:-1].split('\t')
+
+        if len(tokens) < keyColumnCount:
+            if len(tokens) < 22:
+                continue    # reported by processFile()
+            valueDict['marker'].add(tokens[2])
+            valueDict['user'].add(tokens[3])
+            for jNums in tokens[13:17]:
+                if jNums:
+                    valueDict['reference'].update(jNums.split('|'))
+            valueDict['strain'].add(tokens[21])
+            resolveTerms = 1
+            continue
+
+        for keyCol, name, valueCol, vocabKey in keyColumnList:
+            if tokens[valueCol] == '':
+                continue
+            values = tokens[valueCol].split('|')
+            keys = tokens[keyCol].split('|')
+            try:
+                keys = list(map(int, keys))
+            except ValueError:
+                keys = []
+            if len(keys) != len(values):
+                if name == 'term':
+                    resolveTerms = 1
+                else:
+                    valueDict[name].update(values)
+                continue
+            for key, value in zip(keys, values):
+                if name == 'term':
+                    value = (vocabKey, value)
+                carriedDict[name].setdefault(key, set()).add(value)
+
+    fpInputFile.seek(0)
+
+    for name, values in valueDict.items():
+        query, filterCol, keyFilterCol, valueCol, keyCol = keyQueries[name]
+        keyDict = inputKeyDict[name] = {}
+        for chunk in alleleLookups.chunkList(sorted(values), alleleLookups.CHUNK_SIZE):
+            for r in db.sql(alleleLookups.targetedQuery(query, filterCol, chunk), 'auto'):
+                keyDict[r[valueCol]] = r[keyCol]
+
+    if resolveTerms:
+        loadTermKeys()
+
+    for name, carried in carriedDict.items():
+        query, filterCol, keyFilterCol, valueCol, keyCol = keyQueries[name]
+        if name == 'term':
+            keyDict = termKeyDict
+        else:
+            keyDict = inputKeyDict[name]
+        if trustCarriedKeys:
+            for key in carried:
+                for value in carried[key]:
+                    keyDict[value] = key
+            continue
+        for chunk in alleleLookups.chunkList(sorted(carried), alleleLookups.CHUNK_SIZE):
+            for r in db.sql(alleleLookups.keyedQuery(query, keyFilterCol, chunk), 'auto'):
+                value = r[valueCol]
+                if name == 'term':
+                    value = (r['_vocab_key'], value)
+                if value in carried.get(r[keyCol], ()):
+                    keyDict[value] = r[keyCol]
+
+        # a key QC resolved that no longer matches is resolved by name
+        for key in sorted(carried):
+            for value in carried[key]:
+                if keyDict.get(value) != key:
+                    fpDiagFile.write('%s key %s does not match %s, resolving by name\n' % (name, key, value))
+
+    return 0
+
+def verifyMarker(geneID, lineNum):
+    # Purpose: resolve MGI gene ID 'geneID' to its marker key
+    # Returns: the marker key, 0 if the gene ID is invalid
+    # Assumes: loadInputKeys() has been called
+    # Effects: a gene ID not resolved by loadInputKeys() is verified by
+    #     loadlib, which writes the error to fpErrorFile
+    # Throws: Nothing
+
+    markerKey = inputKeyDict['marker'].get(geneID)
+    if markerKey is None:
+        markerKey = loadlib.verifyMarker(geneID, lineNum, fpErrorFile)
+
+    return markerKey
+
+def verifyUser(user, lineNum):
+    # Purpose: resolve login 'user' to its user key
+    # Returns: the user key, 0 if the login is invalid
+    # Assumes: loadInputKeys() has been called
+    # Effects: a login not resolved by loadInputKeys() is verified by
+    #     loadlib, which writes the error to fpErrorFile
+    # Throws: Nothing
+
+    userKey = inputKeyDict['user'].get(user)
+    if userKey is None:
+        userKey = loadlib.verifyUser(user, lineNum, fpErrorFile)
+
+    return userKey
+
+def verifyReference(refID, lineNum):
+    # Purpose: resolve J: number 'refID' to its reference key
+    # Returns: the reference key, 0 if the J: number is invalid
+    # Assumes: loadInputKeys() has been called
+    # Effects: a J: number not resolved by loadInputKeys() is verified by
+    #     loadlib, which writes the error to fpErrorFile
+    # Throws: Nothing
+
+    refKey = inputKeyDict['reference'].get(refID)
+    if refKey is None:
+        refKey = loadlib.verifyReference(refID, lineNum, fpErrorFile)
+
+    return refKey
+
+def verifyStrain(strain, lineNum):
+    # Purpose: resolve 'strain' to its strain key
+    # Returns: the strain key, 0 if the strain is invalid
+    # Assumes: loadInputKeys() has been called
+    # Effects: a strain not resolved by loadInputKeys() is verified by
+    #     sourceloadlib, which writes the error to fpErrorFile
+    # Throws: Nothing
+
+    strainKey = inputKeyDict['strain'].get(strain)
+    if strainKey is None:
+        strainKey = sourceloadlib.verifyStrain(strain, lineNum, fpErrorFile)
+
+    return strainKey
+
+def loadTables(loadTable):
+    # Purpose: load every table with loadTable(table), each table once
+    #     the tables it depends on (tableDependsDict) are loaded and up
+    #     to loadThreads tables at a time
+    # Returns: 0 if every table loaded, else the first non-zero status;
+    #     no table is started once a table has failed
+    # Assumes: loadTable returns 0 if its table loaded, else non-zero
+    # Effects: whatever loadTable does
+    # Throws: Nothing
+
+    pending = list(tableList)
+    loaded = set()
+    running = {}
+    status = 0
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=loadThreads) as executor:
+        while pending or running:
+            for table in list(pending):
+                if status != 0:
+                    break
+                if set(tableDependsDict[table]) <= loaded:
+                    pending.remove(table)
+                    running[executor.submit(loadTable, table)] = table
+
+            if not running:
+                break
+
+            done, notDone = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                table = running.pop(future)
+                tableStatus = future.result()
+                if tableStatus != 0:
+                    if status == 0:
+                        status = tableStatus
+                else:
+                    loaded.add(table)
+
+    return status
+
+def bcpTable(table):
+    # Purpose: BCP one table's bcp file into the database
+    # Returns: the bcpin.csh status code, 0 if no error
+    # Assumes: the bcp file has been closed
+    # Effects: copies data into the db
+    # Throws: Nothing
+
+    bcpCmd = '%s %s %s %s "/" %s "|" "\\n" mgd' % (BCP_COMMAND, \
+        db.get_sqlServer(), db.get_sqlDatabase(), table, bcpFileDict[table])
+
+    fpDiagFile.write('%s\n' % bcpCmd)
+    result = subprocess.run(bcpCmd, shell=True, capture_output=True, text=True)
+    stdout = result.stdout
+    stderr = result.stderr
+    statusCode = result.returncode
+
+    if statusCode != 0:
+        msg = '%s statusCode: %s stderr: %s%s' % (bcpCmd, statusCode, stderr, CRT)
+        fpDiagFile.write(msg)
+
+    return statusCode
+
 def bcpFiles():
     # Purpose: BCPs the data into the database
     # Returns: 1 if error,  else 0
@@ -379,50 +886,11 @@ def bcpFiles():
 
     closeFiles()
 
-    bcpI = '%s %s %s' % (BCP_COMMAND, db.get_sqlServer(), db.get_sqlDatabase())
-    bcpII = '"|" "\\n" mgd'
-
-    bcp1 = '%s %s "/" %s %s' % (bcpI, alleleTable, alleleFileName, bcpII)
-    bcp2 = '%s %s "/" %s %s' % (bcpI, mutationTable, mutationFileName, bcpII)
-    bcp3 = '%s %s "/" %s %s' % (bcpI, refTable, refFileName, bcpII)
-    bcp4 = '%s %s "/" %s %s' % (bcpI, accTable, accFileName, bcpII)
-    bcp5 = '%s %s "/" %s %s' % (bcpI, synonymTable, synonymFileName, bcpII)
-    bcp6 = '%s %s "/" %s %s' % (bcpI, noteTable, noteFileName, bcpII)
-    bcp7 = '%s %s "/" %s %s' % (bcpI, annotTable, annotFileName, bcpII)
-    bcp8 = '%s %s "/" %s %s' % (bcpI, mclTable, mclFileName, bcpII)
-    bcp9 = '%s %s "/" %s %s' % (bcpI, mclAssocTable, mclAssocFileName, bcpII)
-
     db.commit()
 
-    for bcpCmd in [bcp1, bcp2, bcp3, bcp4, bcp5, bcp6, bcp7, bcp8, bcp9]:
-        fpDiagFile.write('%s\n' % bcpCmd)
-        result = subprocess.run(bcpCmd, shell=True, capture_output=True, text=True)
-        stdout = result.stdout
-        stderr = result.stderr
-        statusCode = result.returncode
-
-        if statusCode != 0:
-            msg = '%s statusCode: %s stderr: %s%s' % (bcpCmd, statusCode, stderr, CRT)
-            fpDiagFile.write(msg)
-            return statusCode
-
-
-    # update all_allele_seq auto-sequence
-    db.sql(''' select setval('all_allele_seq', (select max(_Allele_key) from ALL_Allele)) ''', None)
-    # update mgi_reference_assoc_seq auto-sequence
-    db.sql(''' select setval('mgi_reference_assoc_seq', (select max(_Assoc_key) from MGI_Reference_Assoc)) ''', None)
-    # update mgi_note_seq auto-sequence
-    db.sql(''' select setval('mgi_note_seq', (select max(_Note_key) from MGI_Note)) ''', None)
-    # update all_allele_mutation_seq auto-sequence
-    db.sql(''' select setval('all_allele_mutation_seq', (select max(_Assoc_key) from ALL_Allele_Mutation)) ''', None)
-    # update all_allele_cellline_seq auto-sequence
-    db.sql(''' select setval('all_allele_cellline_seq', (select max(_Assoc_key) from ALL_Allele_CellLine)) ''', None)
-    # update voc_annot_seq auto-sequence
-    db.sql(''' select setval('voc_annot_seq', (select max(_Annot_key) from VOC_Annot)) ''', None)
-    # update all_cellline_seq auto-sequence
-    db.sql(''' select setval('all_cellline_seq', (select max(_CellLine_key) from ALL_CellLine)) ''', None)
-    # update mgi_synonym_seq auto-sequence
-    db.sql(''' select setval('mgi_synonym_seq', (select max(_Synonym_key) from MGI_Synonym)) ''', None)
+    statusCode = loadTables(bcpTable)
+    if statusCode != 0:
+        return statusCode
 
     #
     # Update the AccessionMax value
@@ -433,6 +901,106 @@ def bcpFiles():
 
     return 0
 
+def connect():
+    # Purpose: open a connection of the load's own to the database
+    #     the db module is configured for
+    # Returns: the psycopg2 connection
+    # Assumes: Nothing
+    # Effects: connects to the database
+    # Throws: psycopg2.Error if the connection fails
+
+    return psycopg2.connect(host=db.get_sqlServer(), database=db.get_sqlDatabase(),
+        user=db.get_sqlUser(), password=db.get_sqlPassword(),
+        options='-c search_path=%s' % alleleLookups.SCHEMA)
+
+def copyTable(cursor, table):
+    # Purpose: stream one table's rows into the database with COPY FROM STDIN
+    # Returns: Nothing
+    # Assumes: the table's bcp file was opened by openBcpFile() for the
+    #     copy backend
+    # Effects: copies data into the db, uncommitted
+    # Throws: psycopg2.Error if the copy fails
+
+    fp = copyBufferDict[table]
+    fpDiagFile.write('copy %s: %d rows\n' % (table, fp.getvalue().count(CRT)))
+    fp.seek(0)
+    cursor.copy_expert('''copy %s from stdin with null as '' delimiter as '|' ''' % (table), fp)
+
+def copyTableCommitted(table):
+    # Purpose: stream one table's rows into the database on a connection
+    #     of its own and commit them
+    # Returns: 1 if error,  else 0
+    # Assumes: the table's bcp file was opened by openBcpFile() for the
+    #     copy backend
+    # Effects: copies data into the db
+    # Throws: Nothing
+
+    try:
+        conn = connect()
+    except psycopg2.Error as e:
+        fpDiagFile.write('copy %s failed: %s%s' % (table, e, CRT))
+        return 1
+
+    try:
+        copyTable(conn.cursor(), table)
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        fpDiagFile.write('copy %s failed: %s%s' % (table, e, CRT))
+        return 1
+    finally:
+        conn.close()
+
+    return 0
+
+def copyFiles():
+    # Purpose: stream the rows of every table into the database with
+    #     COPY FROM STDIN, and update AccessionMax.
+    #     With loadThreads 1 it is all one transaction; otherwise each
+    #     table is copied and committed on its own connection, in
+    #     dependency order (see loadTables())
+    # Returns: 1 if error,  else 0
+    # Assumes: the bcp files were opened by openBcpFile() for the copy
+    #     backend
+    # Effects: copies data into the db; with loadThreads 1 nothing is
+    #     loaded if any table fails
+    # Throws: Nothing
+
+    global copyBufferDict
+
+    if DEBUG  == 'true':
+        return 0
+
+    closeFiles()
+    db.commit()
+
+    copyBufferDict = {alleleTable : fpAlleleFile, mutationTable : fpMutationFile,
+        refTable : fpRefFile, accTable : fpAccFile, synonymTable : fpSynonymFile,
+        noteTable : fpNoteFile, annotTable : fpAnnotFile, mclTable : fpMclFile,
+        mclAssocTable : fpMutantFile}
+
+    if loadThreads > 1:
+        if loadTables(copyTableCommitted) != 0:
+            return 1
+
+    conn = connect()
+    try:
+        cursor = conn.cursor()
+        if loadThreads <= 1:
+            for table in tableList:
+                copyTable(cursor, table)
+
+        cursor.execute('select * from ACC_setMax(%d)' % (lineNum))
+        conn.commit()
+    except psycopg2.Error as e:
+        conn.rollback()
+        fpDiagFile.write('copy failed, nothing loaded: %s%s' % (e, CRT))
+        return 1
+    finally:
+        conn.close()
+
+    return 0
+
 def processNote(noteTypeKey, note, alleleKey, createdByKey):
     # Purpose: create note for alleleKey
     # Returns: 1 if error,  else 0
@@ -448,7 +1016,7 @@ def processNote(noteTypeKey, note, alleleKey, createdByKey):
             % (noteKey, alleleKey, mgiTypeKey, noteTypeKey, \
                note, createdByKey, createdByKey, loaddate, loaddate))
 
-        noteKey += 1
+        noteKey = keyBlockDict[noteTable].next()
 
     return 0
 
@@ -464,7 +1032,7 @@ def processRefs(refTypeKey, jNums, alleleKey, createdByKey, lineNum):
     #print('jNums: %s' % jNums)
     if jNums:
         for refID in jNums.split('|'):
-            refKey = loadlib.verifyReference(refID, lineNum, fpErrorFile)
+            refKey = verifyReference(refID, lineNum)
             #print('refID: %s lineNum: %s refKey: %s' % (refID, lineNum, refKey))
             if refKey == 0:
                 continue    # error written to fpErrorFile
@@ -472,7 +1040,7 @@ def processRefs(refTypeKey, jNums, alleleKey, createdByKey, lineNum):
                 % (refAssocKey, refKey, alleleKey, mgiTypeKey, refTypeKey, \
                 createdByKey, createdByKey, loaddate, loaddate))
 
-            refAssocKey += 1
+            refAssocKey = keyBlockDict[refTable].next()
     return 0
 
 def processSynonyms(synonyms, alleleKey, createdByKey):
@@ -490,7 +1058,7 @@ def processSynonyms(synonyms, alleleKey, createdByKey):
                 % (synonymKey, alleleKey, mgiTypeKey, generalSynonymTypeKey, 
                 synonymRefKey, s, createdByKey, createdByKey, loaddate, loaddate))
 
-            synonymKey += 1
+            synonymKey = keyBlockDict[synonymTable].next()
     return 0
     
 def processSubtypes(subtypes, alleleKey, lineNum):
@@ -506,12 +1074,12 @@ def processSubtypes(subtypes, alleleKey, lineNum):
         for s in subtypes.split('|'):
             #print('lineNum: %s subtype: %s' % (lineNum, s))
             # _vocab_key = 93 (Allele Subtype)
-            alleleSubtypeKey = loadlib.verifyTerm('', 93, s, lineNum, fpErrorFile)
+            alleleSubtypeKey = verifyTerm(93, s, lineNum)
 
             fpAnnotFile.write('%s|%s|%s|%s|%s|%s|%s\n' \
                 % (annotKey, annotTypeKey, alleleKey, alleleSubtypeKey, \
                     qualifierKey, loaddate, loaddate))
-            annotKey += 1
+            annotKey = keyBlockDict[annotTable].next()
     return 0
 
 def processMutations(molMuts, alleleKey, lineNum):
@@ -523,10 +1091,10 @@ def processMutations(molMuts, alleleKey, lineNum):
     for m in molMuts.split('|'):
             #print('lineNum: %s mutation: %s' % (lineNum, m))
             # _vocab_key = 36 (Allele Molecular Mutation)
-            mutationTermKey = loadlib.verifyTerm('', 36, m, lineNum, fpErrorFile)
+            mutationTermKey = verifyTerm(36, m, lineNum)
             fpMutationFile.write('%s|%s|%s|%s|%s\n' \
                 % (alleleMutationKey, alleleKey, mutationTermKey, loaddate, loaddate))
-            alleleMutationKey += 1
+            alleleMutationKey = keyBlockDict[mutationTable].next()
     return 0
 
 def processMCLs(mclKeyList, derivationKey, strainOfOriginKey, alleleKey, createdByKey):
@@ -543,7 +1111,7 @@ def processMCLs(mclKeyList, derivationKey, strainOfOriginKey, alleleKey, created
             fpMutantFile.write('%s|%s|%s|%s|%s|%s|%s\n' \
                 % (mutantAssocKey, alleleKey, m, \
                     createdByKey, createdByKey, loaddate, loaddate))
-            mutantAssocKey += 1
+            mutantAssocKey = keyBlockDict[mclAssocTable].next()
 
     else:
         # otherwise create new not specified MCL with derivation
@@ -555,8 +1123,8 @@ def processMCLs(mclKeyList, derivationKey, strainOfOriginKey, alleleKey, created
         fpMutantFile.write('%s|%s|%s|%s|%s|%s|%s\n' \
             % (mutantAssocKey, alleleKey, mclKey, \
                 createdByKey, createdByKey, loaddate, loaddate))
-        mclKey += 1
-        mutantAssocKey += 1
+        mclKey = keyBlockDict[mclTable].next()
+        mutantAssocKey = keyBlockDict[mclAssocTable].next()
 
     return 0
 def processFile():
@@ -609,28 +1177,28 @@ def processFile():
             exit(1, 'Invalid Line (%d): %s\n' % (lineNum, line))
 
         # marker key
-        markerKey = loadlib.verifyMarker(geneID, lineNum, fpErrorFile)
+        markerKey = verifyMarker(geneID, lineNum)
             
         # creator
-        createdByKey = loadlib.verifyUser(user, lineNum, fpErrorFile)
+        createdByKey = verifyUser(user, lineNum)
 
         # _vocab_key = 37 (Allele Status)
-        alleleStatusKey = loadlib.verifyTerm('', 37, aStatus, lineNum, fpErrorFile)
+        alleleStatusKey = verifyTerm(37, aStatus, lineNum)
 
         # _vocab_key = 38 (Allele Type)
-        alleleTypeKey = loadlib.verifyTerm('', 38, aType, lineNum, fpErrorFile)
+        alleleTypeKey = verifyTerm(38, aType, lineNum)
 
         # _vocab_key = 35 (Allele Inheritance Mode)
-        inheritanceModeKey = loadlib.verifyTerm('', 35, inheritMode, lineNum, fpErrorFile)
+        inheritanceModeKey = verifyTerm(35, inheritMode, lineNum)
 
         # _vocab_key = 61 (Allele Transmission)
-        transmissionKey = loadlib.verifyTerm('', 61, transmission, lineNum, fpErrorFile)
+        transmissionKey = verifyTerm(61, transmission, lineNum)
 
         # _vocab_key = 92 (Allele Collection)
-        collectionKey = loadlib.verifyTerm('', 92, collection, lineNum, fpErrorFile)
+        collectionKey = verifyTerm(92, collection, lineNum)
 
         # strain of origin
-        strainOfOriginKey = sourceloadlib.verifyStrain(soo, lineNum, fpErrorFile)
+        strainOfOriginKey = verifyStrain(soo, lineNum)
 
         # if errors, continue to next record
         # errors are stored (via loadlib) in the .error log
@@ -688,7 +1256,7 @@ def processFile():
  
         accKey += 1
         mgiKey += 1
-        alleleKey += 1
+        alleleKey = keyBlockDict[alleleTable].next()
 
     #   end of "for line in inputFile.readlines():"
 
@@ -702,20 +1270,36 @@ def processFile():
 
     return 0
 
-#
-# MAIN
-#
-if initialize() != 0:
-    exit(1, 'Error in  initialize \n' )
+def main():
+    # Purpose: run the load
+    # Returns: Nothing
+    # Assumes: Nothing
+    # Effects: exits with 0 if the load succeeded, else 1
+    # Throws: Nothing
+
+    if initialize() != 0:
+        exit(1, 'Error in  initialize \n' )
+
+    if setPrimaryKeys() != 0:
+        exit(1, 'Error in setPrimaryKeys \n')
 
-if setPrimaryKeys() != 0:
-    exit(1, 'Error in setPrimaryKeys \n')
+    if loadInputKeys() != 0:
+        exit(1, 'Error in loadInputKeys \n')
 
-if processFile() != 0:
-    exit(1, 'Error in processFile \n')
+    if processFile() != 0:
+        exit(1, 'Error in processFile \n')
 
-if bcpFiles() != 0:
-    exit(1, 'Error in bcpFiles')
+    if loadBackend == 'copy':
+        if copyFiles() != 0:
+            exit(1, 'Error in copyFiles')
+    elif bcpFiles() != 0:
+        exit(1, 'Error in bcpFiles')
 
-exit(0, 'curatoralleleload successful')
+    exit(0, 'curatoralleleload successful')
+
+#
+# MAIN
+#
+if __name__ == '__main__':
+    main()
 
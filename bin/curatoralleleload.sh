@@ -109,11 +109,45 @@ then
     fi
 fi
 
-echo "" >> ${LOG_DIAG}
-date >> ${LOG_DIAG}
-echo "Run QC checks"  | tee -a ${LOG_DIAG}
-${CURATORALLELELOAD}/bin/alleleQC.sh ${INPUT_FILE_DEFAULT} live
-STAT=$?
+if [ "${PIPELINE_MODE}" = "true" ]
+then
+    #
+    # run the QC checks and the load in one process; it exits with the
+    # QC exit code, or 5 if the load failed, and writes the QC exit code
+    # to QC_STATUS_FILE either way
+    #
+    echo "" >> ${LOG_DIAG}
+    date >> ${LOG_DIAG}
+    echo "Run QC checks and curatoralleleload.py"  | tee -a ${LOG_DIAG}
+    dos2unix ${INPUT_FILE_DEFAULT} ${INPUT_FILE_DEFAULT} 2>/dev/null
+
+    #
+    # the output goes to the QC log, as alleleQC.sh's does
+    #
+    rm -rf ${QC_LOGFILE}
+    touch ${QC_LOGFILE}
+    TMP_FILE=/tmp/`basename $0`.$$
+    QC_STATUS_FILE=/tmp/`basename $0`.qc.$$
+    export QC_STATUS_FILE
+    trap "rm -f ${TMP_FILE} ${QC_STATUS_FILE}" 0 1 2 15
+    { ${PYTHON} ${CURATORALLELELOAD}/bin/curatoralleleloadPipeline.py ${INPUT_FILE_DEFAULT} 2>&1; echo $? > ${TMP_FILE}; } >> ${QC_LOGFILE}
+    STAT=`cat ${TMP_FILE}`
+    if [ ${STAT} -eq 5 ]
+    then
+        # the QC status is still reported below
+        LOAD_STAT=1
+        STAT=`cat ${QC_STATUS_FILE}`
+    else
+        LOAD_STAT=0
+    fi
+else
+    echo "" >> ${LOG_DIAG}
+    date >> ${LOG_DIAG}
+    echo "Run QC checks"  | tee -a ${LOG_DIAG}
+    ${CURATORALLELELOAD}/bin/alleleQC.sh ${INPUT_FILE_DEFAULT} live
+    STAT=$?
+fi
+
 if [ ${STAT} -eq 1 ]
 then
     checkStatus ${STAT} "An error occurred while generating the QC reports - See ${QC_LOGFILE}. alleleQC.sh"
@@ -142,14 +176,20 @@ fi
 
 
 #
-# run the load
+# run the load, unless it was run with the QC checks
 #
-echo "" >> ${LOG_DIAG}
-date >> ${LOG_DIAG}
-echo "Run curatoralleleload.py"  | tee -a ${LOG_DIAG}
-${PYTHON} ${CURATORALLELELOAD}/bin/curatoralleleload.py  
-STAT=$?
-checkStatus ${STAT} "${CURATORALLELELOAD}/bin/curatoralleleload.py"
+if [ "${PIPELINE_MODE}" = "true" ]
+then
+    STAT=${LOAD_STAT}
+    checkStatus ${STAT} "${CURATORALLELELOAD}/bin/curatoralleleloadPipeline.py"
+else
+    echo "" >> ${LOG_DIAG}
+    date >> ${LOG_DIAG}
+    echo "Run curatoralleleload.py"  | tee -a ${LOG_DIAG}
+    ${PYTHON} ${CURATORALLELELOAD}/bin/curatoralleleload.py  
+    STAT=$?
+    checkStatus ${STAT} "${CURATORALLELELOAD}/bin/curatoralleleload.py"
+fi
 
 #
 # Archive a copy of the input file, adding a timestamp suffix.
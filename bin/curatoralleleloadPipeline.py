@@ -0,0 +1,142 @@
+
+#  curatoralleleloadPipeline.py
+###########################################################################
+#
+#  Purpose:
+#
+#	This script QCs a curator allele input file and loads the alleles
+#	    that pass in one process: the alleleQC.py checks, then the
+#	    curatoralleleload.py load of the load ready file they write,
+#	    sharing one database connection and one set of lookups
+#
+#  Usage:
+#
+#      curatoralleleloadPipeline.py  filename
+#
+#      where:
+#          filename = path to the input file
+#
+#  Env Vars:
+#
+#      See the configuration file
+#
+#      QC_STATUS_FILE - optional, set by curatoralleleload.sh: the file
+#          the QC exit code is written to, so it is known even if the
+#          load fails
+#
+#  Inputs:
+#
+#      - input file as parameter - see USAGE
+#
+#  Outputs:
+#
+#      - the alleleQC.py QC report, results and load ready file
+#      - the curatoralleleload.py bcp files, diagnostics and error files
+#
+#  Exit Codes:
+#
+#      0:  Successful completion
+#      1:  An exception occurred in the QC checks; nothing was loaded
+#      2:  Report/Skip and Warning QC errors detected, the rest loaded
+#      3:  Report/Skip QC errors detected, the rest loaded
+#      4:  Warning QC errors detected, loaded
+#      5:  The load failed; the QC exit code is in QC_STATUS_FILE
+#
+#  Assumes:  Nothing
+#
+#  Implementation:
+#
+#      This script will perform following steps:
+#
+#      1) Run the alleleQC.py stages on the input file, writing the QC
+#         report and the load ready file
+#      2) Run curatoralleleload.py on the load ready file on the same
+#         connection. The database keys carried in the load ready file
+#         were resolved by this process's lookups, so the load uses
+#         them without checking them again
+#
+#  History:
+#
+# 10/16/2026
+#       - initial version
+#
+###########################################################################
+
+import sys
+import os
+import time
+import db
+import alleleQC
+import curatoralleleload
+
+# exit code if the load fails; alleleQC.py's exit codes are 0-4
+LOAD_FAILED = 5
+
+# file the QC exit code is written to
+qcStatusFile = os.getenv('QC_STATUS_FILE')
+
+#
+# Purpose: run the QC checks on the input file
+# Returns: the QC exit code
+# Assumes: Nothing
+# Effects: writes the QC report and the load ready file, creates
+#       connection to a database
+# Throws: Nothing
+#
+
+def runQc():
+
+    alleleQC.checkArgs()
+    alleleQC.runStage('init', alleleQC.init)
+    alleleQC.runStage('runQcChecks', alleleQC.runQcChecks)
+    alleleQC.runStage('writeReport', alleleQC.writeReport)
+    alleleQC.writeResultsSummary()
+    alleleQC.closeFiles()
+
+    if alleleQC.qcTiming:
+        alleleQC.writeTimingReport()
+
+    return alleleQC.exitCode()
+
+# end runQc() -------------------------------
+
+#
+# Purpose: load the load ready file written by runQc()
+# Returns: 0 if the load succeeded, else 1
+# Assumes: runQc() has been run
+# Effects: writes the bcp files and loads them into the database,
+#       closes the connection to the database
+# Throws: Nothing
+#
+
+def runLoad():
+
+    curatoralleleload.trustCarriedKeys = 1
+
+    try:
+        curatoralleleload.main()
+    except SystemExit as e:
+        return e.code
+
+    return 0
+
+# end runLoad() -------------------------------
+
+#
+# Main
+#
+if __name__ == '__main__':
+
+    qcRc = runQc()
+    print('QC done, exit code %s: %s' % (qcRc, time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time()))))
+    sys.stdout.flush()
+
+    if qcStatusFile:
+        with open(qcStatusFile, 'w') as fp:
+            fp.write('%s\n' % qcRc)
+
+    if runLoad() != 0:
+        sys.exit(LOAD_FAILED)
+
+    print('load done: %s' % time.strftime("%H.%M.%S.%m.%d.%y", time.localtime(time.time())))
+    sys.exit(qcRc)
@@ -0,0 +1,112 @@
+
+#  testAlleleLookups.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Tests of the alleleLookups.py lookup snapshot as alleleQC.py uses it
+#
+#  Usage:
+#
+#      python -m unittest discover -s test
+#
+#      Needs the MGI db and psycopg2 modules on PYTHONPATH; the tests
+#      are skipped without them. The database itself is not queried.
+#
+#  History:
+#
+# 10/16/2026
+#       - initial version
+#
+###########################################################################
+
+import os
+import re
+import sys
+import tempfile
+import unittest
+
+binDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bin')
+sys.path.insert(0, binDir)
+
+# alleleQC.py reads its configuration when imported
+os.environ.setdefault('QC_RPT', os.devnull)
+
+try:
+    import alleleLookups
+    import alleleQC
+except ImportError:
+    alleleLookups = None
+
+configFile = os.path.join(binDir, '..', 'curatoralleleload.config.default')
+
+#
+# Purpose: read a setting from the default configuration file
+# Returns: the setting's value as a string
+# Assumes: the setting is assigned on a line of its own
+# Effects: reads configFile
+#
+def configValue(name):
+
+    with open(configFile) as fp:
+        for line in fp:
+            match = re.match(r'%s=(.*)$' % name, line.strip())
+            if match:
+                return match.group(1)
+
+    return None
+
+@unittest.skipIf(alleleLookups is None, 'MGI db / psycopg2 modules not installed')
+class SnapshotTest(unittest.TestCase):
+    # Is: the tests of alleleQC.loadLookups() with a lookup snapshot
+    # Has: a temporary snapshot file, a count of lookup query runs
+    # Does: replaces the module's query functions with canned results
+    #       so that the lookups load without a database
+
+    def setUp(self):
+
+        self.tmpDir = tempfile.TemporaryDirectory()
+        self.snapshotFile = os.path.join(self.tmpDir.name, 'alleleQC.lookups.marshal')
+        self.queryRuns = 0
+
+        # the default config, which targets the lookups of small inputs
+        alleleQC.lookupCacheFile = self.snapshotFile
+        alleleQC.lookupTargetedMax = int(configValue('LOOKUP_TARGETED_MAX'))
+        alleleQC.inputValues = {'reference' : {'J:12345'}, 'user' : {'cjb'}}
+        alleleQC.inputMclSet = set()
+
+        self.saved = (alleleLookups.runQueries, alleleLookups.timedSql,
+            alleleLookups.db.get_sqlServer, alleleLookups.db.get_sqlDatabase)
+        alleleLookups.runQueries = self.runQueries
+        alleleLookups.timedSql = self.timedSql
+        alleleLookups.db.get_sqlServer = lambda: 'server'
+        alleleLookups.db.get_sqlDatabase = lambda: 'database'
+
+    def tearDown(self):
+
+        (alleleLookups.runQueries, alleleLookups.timedSql,
+            alleleLookups.db.get_sqlServer, alleleLookups.db.get_sqlDatabase) = self.saved
+        self.tmpDir.cleanup()
+
+    def runQueries(self, queries, threads = 1, stats = None):
+        self.queryRuns += 1
+        return {name : [] for name in queries}
+
+    def timedSql(self, query, stats, name):
+        return [{'allele' : '1'}]
+
+    def testSecondRunLoadsSnapshot(self):
+        self.assertTrue(len(alleleQC.inputValues['reference']) <= alleleQC.lookupTargetedMax)
+
+        alleleQC.loadLookups()
+        self.assertEqual(alleleQC.lookups.targeted, [])
+        self.assertTrue(os.path.exists(self.snapshotFile))
+        self.assertEqual(self.queryRuns, 1)
+
+        # the second run's lookups come from the snapshot, not the database
+        alleleQC.loadLookups()
+        self.assertEqual(self.queryRuns, 1)
+        self.assertIn('snapshot', alleleQC.lookups.stats)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+
+#  testAlleleQC.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Tests of the alleleQC.py QC rules
+#
+#  Usage:
+#
+#      python -m unittest discover -s test
+#
+#      Needs the MGI db and psycopg2 modules on PYTHONPATH; the tests
+#      are skipped without them. The database itself is not queried.
+#
+#  History:
+#
+# 10/16/2026
+#       - initial version
+#
+###########################################################################
+
+import os
+import sys
+import unittest
+
+binDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bin')
+sys.path.insert(0, binDir)
+
+# alleleQC.py reads its configuration when imported
+os.environ.setdefault('QC_RPT', os.devnull)
+
+try:
+    import alleleLookups
+    import alleleQC
+except ImportError:
+    alleleQC = None
+
+@unittest.skipIf(alleleQC is None, 'MGI db / psycopg2 modules not installed')
+class MclResolutionTest(unittest.TestCase):
+    # Is: the tests of the MCL resolution rules in alleleQC.validateLines()
+    # Has: lookups holding two mutant cell lines of parent cell line
+    #      'PCL1', one of them of another strain
+    # Does: runs the resolution rules alone on a line naming MCLs
+
+    def setUp(self):
+
+        alleleQC.resetState()
+        alleleQC.fpResults = None
+        alleleQC.initRules()
+        alleleQC.activeRuleList = [r for r in alleleQC.activeRuleList if r.cost >= alleleQC.COST_RESOLVE]
+
+        alleleQC.lookups = alleleLookups.Lookups()
+        alleleQC.lookups.mutantCellLines = {
+            'MCL1' : [(1, 'PCL2', 'C57BL/6J')],
+            'MCL2' : [(2, 'PCL1', '129S6/SvEvTac')],
+            }
+
+    def record(self, mcls, skipLine = 0):
+        # a parsed TAR line naming 'mcls', of parent cell line PCL1 and
+        # strain C57BL/6J
+        fields = dict([(name, '') for name in alleleQC.columnNameList])
+        fields.update({'aSym' : 'Gene1<tm1Abc>', 'alleleType' : alleleQC.TAR,
+            'pcl' : 'PCL1', 'soo' : 'C57BL/6J', 'mcls' : mcls})
+        columns = [fields[name] for name in alleleQC.columnNameList]
+        return (2, '\t'.join(columns) + '\n', columns, skipLine)
+
+    def errors(self):
+        return [(e[1], e[2]) for e in alleleQC.errorIndex]
+
+    def testEveryResolutionErrorReported(self):
+        # MCL1 fails MCL_PCL_MISMATCH; MCL_SOO_MISMATCH must still run
+        # and report MCL2
+        alleles = list(alleleQC.validateLines([self.record('MCL1|MCL2')]))
+
+        self.assertEqual(alleles, [])
+        self.assertEqual(sorted(self.errors()), [('MCL_PCL_MISMATCH', 'MCL1'),
+            ('MCL_SOO_MISMATCH', 'C57BL/6J')])
+
+    def testSkippedLineNotResolved(self):
+        alleles = list(alleleQC.validateLines([self.record('MCL1|MCL2', skipLine = 1)]))
+
+        self.assertEqual(alleles, [])
+        self.assertEqual(self.errors(), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,242 @@
+
+#  testCuratorAlleleLoad.py
+###########################################################################
+#
+#  Purpose:
+#
+#	Tests of the curatoralleleload.py table load scheduler and key
+#	    reservation
+#
+#  Usage:
+#
+#      python -m unittest discover -s test
+#
+#      Needs the MGI db, loadlib and psycopg2 modules on PYTHONPATH; the
+#      tests are skipped without them. The database itself is not used.
+#
+#  History:
+#
+# 10/16/2026
+#       - initial version
+#
+###########################################################################
+
+import io
+import os
+import sys
+import time
+import tempfile
+import threading
+import unittest
+
+binDir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'bin')
+sys.path.insert(0, binDir)
+
+# curatoralleleload.py reads its configuration when imported
+os.environ.setdefault('INPUT_FILE_QC', os.devnull)
+os.environ.setdefault('OUTPUTDIR', tempfile.gettempdir())
+os.environ.setdefault('PG_DBUTILS', '')
+
+try:
+    import curatoralleleload
+except ImportError:
+    curatoralleleload = None
+
+@unittest.skipIf(curatoralleleload is None, 'MGI db / loadlib / psycopg2 modules not installed')
+class LoadTablesTest(unittest.TestCase):
+    # Is: the tests of curatoralleleload.loadTables()
+    # Has: the start and finish events of each table, in order
+    # Does: loads the tables with a loadTable that only records events,
+    #       on enough threads to start every table whose dependencies
+    #       are loaded at once
+
+    def setUp(self):
+
+        self.saved = curatoralleleload.loadThreads
+        curatoralleleload.loadThreads = len(curatoralleleload.tableList)
+        self.events = []
+        self.lock = threading.Lock()
+        self.failTable = None
+
+        # set once every table without dependencies has started
+        self.rootTables = set([t for t in curatoralleleload.tableList if not curatoralleleload.tableDependsDict[t]])
+        self.rootsStarted = threading.Event()
+
+    def tearDown(self):
+
+        curatoralleleload.loadThreads = self.saved
+
+    def loadTable(self, table):
+        with self.lock:
+            self.events.append(('start', table))
+            if self.rootTables <= set([e[1] for e in self.events]):
+                self.rootsStarted.set()
+        if table == self.failTable:
+            # fail once the tables started with it are running, before
+            # any other table finishes
+            self.rootsStarted.wait(5)
+        else:
+            # long enough for a wrongly scheduled table to start meanwhile
+            time.sleep(0.05)
+        with self.lock:
+            self.events.append(('finish', table))
+        if table == self.failTable:
+            return 1
+        return 0
+
+    def eventIndex(self, event, table):
+        return self.events.index((event, table))
+
+    def testDependenciesFinishFirst(self):
+        status = curatoralleleload.loadTables(self.loadTable)
+
+        self.assertEqual(status, 0)
+        for table in curatoralleleload.tableList:
+            self.assertIn(('finish', table), self.events)
+
+        alleleTable = curatoralleleload.alleleTable
+        mclTable = curatoralleleload.mclTable
+        for table in curatoralleleload.tableList:
+            if table in (alleleTable, mclTable):
+                continue
+            self.assertLess(self.eventIndex('finish', alleleTable), self.eventIndex('start', table))
+        self.assertLess(self.eventIndex('finish', mclTable),
+            self.eventIndex('start', curatoralleleload.mclAssocTable))
+
+    def checkNoTableStartsAfterFailure(self, failTable):
+        self.failTable = failTable
+
+        status = curatoralleleload.loadTables(self.loadTable)
+
+        self.assertEqual(status, 1)
+        failed = self.eventIndex('finish', failTable)
+        self.assertEqual([e for e in self.events[failed:] if e[0] == 'start'], [])
+        # only the tables without dependencies started
+        self.assertEqual(set([e[1] for e in self.events if e[0] == 'start']),
+            set([curatoralleleload.alleleTable, curatoralleleload.mclTable]))
+
+    def testNoTableStartsAfterAlleleFails(self):
+        self.checkNoTableStartsAfterFailure(curatoralleleload.alleleTable)
+
+    def testNoTableStartsAfterCellLineFails(self):
+        # ALL_Allele loads after ALL_CellLine failed; the tables that
+        # only need ALL_Allele must still not start
+        self.checkNoTableStartsAfterFailure(curatoralleleload.mclTable)
+
+@unittest.skipIf(curatoralleleload is None, 'MGI db / loadlib / psycopg2 modules not installed')
+class KeyBlockTest(unittest.TestCase):
+    # Is: the tests of curatoralleleload.KeyBlock
+    # Has: a KeyBlock holding keys that are not contiguous
+    # Does: checks the keys are handed out and described in order
+
+    def setUp(self):
+
+        # reserve nothing from the database, then hold the keys another
+        # user of the sequence left gaps in
+        self.keyBlock = curatoralleleload.KeyBlock('all_allele_seq', 0)
+        self.keyBlock.keys = [5, 6, 7, 10, 12, 13]
+
+    def testDescribe(self):
+        self.assertEqual(self.keyBlock.describe(), 'all_allele_seq: 6 keys reserved 5-7, 10, 12-13')
+
+    def testNext(self):
+        keys = [self.keyBlock.next() for i in range(6)]
+
+        self.assertEqual(keys, [5, 6, 7, 10, 12, 13])
+        self.assertEqual(self.keyBlock.next(), None)
+
+@unittest.skipIf(curatoralleleload is None, 'MGI db / loadlib / psycopg2 modules not installed')
+class CountRowsTest(unittest.TestCase):
+    # Is: the tests of curatoralleleload.countRows() against the rows
+    #     processFile() writes
+    # Has: a load ready file whose values all resolve, the bcp files
+    #      in memory
+    # Does: reserves the keys countRows() asks for and checks
+    #       processFile() never runs out of them
+
+    # load ready lines: named MCLs, a new NS MCL, and no MCL
+    inputLines = [
+        ['Gene1<tm1Abc>', 'targeted 1', 'MGI:1', 'cjb', 'Approved', 'Targeted',
+         'Recessive', 'Germline', 'EUCOMM', 'mol note', 'nomen note', 'gen note',
+         'colony', 'J:1', 'J:2', 'J:1|J:2', 'J:1|J:2|J:3', 'syn1|syn2',
+         'Reporter|Null/knockout', 'Insertion|Intragenic deletion', 'PCL1',
+         'C57BL/6J', '101|102', ''],
+        ['Gene2<tm1Abc>', 'targeted 2', 'MGI:2', 'cjb', 'Approved', 'Targeted',
+         'Recessive', 'Germline', 'EUCOMM', '', 'nomen note', '', '',
+         'J:1', '', '', '', '', 'Reporter', 'Insertion', 'Not Specified',
+         'C57BL/6J', '', '55'],
+        ['Gene3<tm1Abc>', 'targeted 3', 'MGI:1', 'cjb', 'Approved', 'Targeted',
+         'Recessive', 'Germline', 'EUCOMM', '', '', '', '', '', '', '', '',
+         '', '', '', '', 'C57BL/6J', '', ''],
+        ]
+
+    termList = [(37, 'Approved'), (38, 'Targeted'), (35, 'Recessive'),
+        (61, 'Germline'), (92, 'EUCOMM'), (93, 'Reporter'),
+        (93, 'Null/knockout'), (36, 'Insertion'), (36, 'Intragenic deletion')]
+
+    fileList = ['fpAlleleFile', 'fpMutationFile', 'fpRefFile', 'fpAccFile',
+        'fpNoteFile', 'fpSynonymFile', 'fpAnnotFile', 'fpMutantFile', 'fpMclFile']
+
+    def setUp(self):
+
+        cal = curatoralleleload
+        self.saved = dict([(name, getattr(cal, name, None)) for name in self.fileList +
+            ['fpInputFile', 'DEBUG', 'inputKeyDict', 'termKeyDict', 'keyBlockDict',
+             'alleleKey', 'refAssocKey', 'noteKey', 'synonymKey', 'alleleMutationKey',
+             'mutantAssocKey', 'annotKey', 'mclKey', 'accKey', 'mgiKey']])
+
+        for name in self.fileList:
+            setattr(cal, name, io.StringIO())
+        cal.fpInputFile = io.StringIO(''.join(['\t'.join(tokens) + '\n' for tokens in self.inputLines]))
+        cal.DEBUG = 'true'
+
+        cal.inputKeyDict = {'marker' : {'MGI:1' : 11, 'MGI:2' : 12},
+            'user' : {'cjb' : 1001},
+            'reference' : {'J:1' : 21, 'J:2' : 22, 'J:3' : 23},
+            'strain' : {'C57BL/6J' : 31}}
+        cal.termKeyDict = dict([(term, i + 41) for i, term in enumerate(self.termList)])
+
+    def tearDown(self):
+
+        for name, value in self.saved.items():
+            setattr(curatoralleleload, name, value)
+
+    def testCountCoversRowsWritten(self):
+        cal = curatoralleleload
+        rowCountDict = cal.countRows()
+
+        # hand out keys 1000 apart per table, as setPrimaryKeys() would
+        cal.keyBlockDict = {}
+        for i, (sequence, table) in enumerate(cal.keySequenceList):
+            cal.keyBlockDict[table] = cal.KeyBlock(sequence, 0)
+            cal.keyBlockDict[table].keys = list(range((i + 1) * 1000, (i + 1) * 1000 + rowCountDict[table]))
+        cal.alleleKey = cal.keyBlockDict[cal.alleleTable].next()
+        cal.refAssocKey = cal.keyBlockDict[cal.refTable].next()
+        cal.noteKey = cal.keyBlockDict[cal.noteTable].next()
+        cal.synonymKey = cal.keyBlockDict[cal.synonymTable].next()
+        cal.alleleMutationKey = cal.keyBlockDict[cal.mutationTable].next()
+        cal.mutantAssocKey = cal.keyBlockDict[cal.mclAssocTable].next()
+        cal.annotKey = cal.keyBlockDict[cal.annotTable].next()
+        cal.mclKey = cal.keyBlockDict[cal.mclTable].next()
+        cal.accKey = 1
+        cal.mgiKey = 1
+
+        self.assertEqual(cal.processFile(), 0)
+
+        tableFileDict = {cal.alleleTable : cal.fpAlleleFile, cal.mutationTable : cal.fpMutationFile,
+            cal.refTable : cal.fpRefFile, cal.noteTable : cal.fpNoteFile,
+            cal.synonymTable : cal.fpSynonymFile, cal.annotTable : cal.fpAnnotFile,
+            cal.mclAssocTable : cal.fpMutantFile, cal.mclTable : cal.fpMclFile}
+        for table, fp in tableFileDict.items():
+            rows = fp.getvalue().splitlines()
+            self.assertTrue(len(rows) <= rowCountDict[table], table)
+            # every row was keyed from the block
+            for row in rows:
+                self.assertNotEqual(row.split('|')[0], 'None', table)
+
+        # every value resolves, so the count is exact
+        self.assertEqual(rowCountDict, dict([(table, len(fp.getvalue().splitlines()))
+            for table, fp in tableFileDict.items()]))
+
+if __name__ == '__main__':
+    unittest.main()